@@ -0,0 +1,177 @@
+"""
+Parallel invoicing of many order books.
+
+Writes one invoice per customer, e.g. at month end, rendering and
+writing the invoices in a pool of worker processes. Order books are
+read lazily and only a bounded number of tasks are in flight, so the
+memory used does not grow with the number of customers.
+
+Usage:
+>>> books = {"customer-1": order_manager_1, "customer-2": orders_2}
+>>> manifest = generate_invoices(books, "invoices", max_workers=8)
+>>> manifest["invoices"][0]["path"]
+'invoices/invoice_customer-1.txt'
+"""
+
+from __future__ import annotations
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+import os
+import struct
+import time
+import pricelist
+from batching import checked_file_name, chunks
+from invoice_writer import StreamingInvoice
+from order_export import pack_records, unpack_records
+from order_manager import OrderManager
+
+
+def invoice_path(output_dir: str, customer: str) -> str:
+    """
+    Returns the file the invoice of a customer is written to.
+
+    Args:
+        output_dir (str): The directory holding the invoices.
+        customer (str): The customer ID.
+
+    Raises:
+        ValueError: If the customer ID cannot be used in a file name.
+    """
+    customer = checked_file_name(customer, "Customer ID")
+    return os.path.join(output_dir, f"invoice_{customer}.txt")
+
+
+def _write_invoices(tasks: list, prices: pricelist.PriceSnapshot) -> list:
+    """
+    Renders and writes the invoices of a chunk of order books.
+
+    Runs in a worker process. The orders are streamed straight into
+    their invoices, without rebuilding an order book. A failing
+    invoice is reported in its manifest entry rather than stopping
+    the other invoices.
+
+    Args:
+        tasks (list[tuple[str, bytes | list[dict], str]]):
+        The customer ID, orders and invoice path of each book, the
+        orders either as binary records or as dicts.
+        prices (PriceSnapshot):
+        The prices of the parent process, for volume discounts.
+
+    Returns:
+        list[dict]: The manifest entry of each invoice.
+    """
+    entries = []
+    for customer, orders, path in tasks:
+        start = time.perf_counter()
+        entry = {"customer": customer, "path": path}
+        try:
+            if isinstance(orders, bytes):
+                orders = unpack_records(orders)
+            with StreamingInvoice(path, OrderManager.format_order,
+                                  pricing=prices.pricing) as invoice:
+                for order in orders:
+                    invoice.add(order)
+            entry["orders"] = invoice.orders_written
+            entry["total_cost"] = invoice.total_cost
+            entry["discount"] = prices.pricing.discount(
+                invoice.total_cost, invoice.orders_written)
+        except (KeyError, TypeError, ValueError, OSError) as error:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        entry["seconds"] = time.perf_counter() - start
+        entries.append(entry)
+    return entries
+
+
+def _tasks(books, output_dir: str):
+    """
+    Turns order books into picklable invoicing tasks.
+
+    Orders are sent as binary records (see `order_export`), which
+    pickle and unpickle several times faster than dicts; books with
+    vehicles that have no type code are sent as plain dicts.
+
+    Yields:
+        tuple[str, bytes | list[dict], str]:
+        The customer ID, orders and invoice path of each book.
+    """
+    if isinstance(books, Mapping):
+        books = books.items()
+    for customer, book in books:
+        path = invoice_path(output_dir, customer)
+        if not isinstance(book, OrderManager):
+            book = list(book)
+        try:
+            orders = pack_records(_iter_book(book))
+        except (ValueError, struct.error):
+            # Plain dicts, as the views of a compact store would pickle
+            # their whole store.
+            orders = [dict(order) for order in _iter_book(book)]
+        yield str(customer), orders, path
+
+
+def _iter_book(book):
+    """Iterates over the orders of an order manager or a list."""
+    return book.iter_orders() if isinstance(book, OrderManager) \
+        else iter(book)
+
+
+def generate_invoices(books, output_dir: str = "invoices",
+                      max_workers: int = None, max_in_flight: int = None,
+                      books_per_task: int = 16) -> dict:
+    """
+    Writes the invoice of each order book to its own file, in
+    parallel.
+
+    Each invoice is named after its customer, see `invoice_path`.
+
+    Args:
+        books (Mapping | Iterable[tuple[str, OrderManager | Iterable]]):
+        Customer IDs mapped to their order books, either an
+        OrderManager or the orders themselves.
+        output_dir (str, optional):
+        The directory to write to, created if missing.
+        Default is "invoices".
+        max_workers (int, optional):
+        The number of worker processes. Defaults to the CPU count.
+        max_in_flight (int, optional):
+        The maximum number of tasks submitted but not yet collected,
+        which bounds the orders held in memory. Default is two per
+        worker.
+        books_per_task (int, optional):
+        The number of order books invoiced per task. Default is 16.
+
+    Returns:
+        dict: The manifest, with "invoices", an entry per book in the
+        order given holding its "customer", "path", "orders",
+        "total_cost" and volume "discount" (in öre) and "seconds", or
+        an "error" if it failed; and the overall "orders", "failed"
+        count and wall-clock "seconds".
+
+    Raises:
+        ValueError: If a customer ID cannot be used in a file name.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * max_workers
+
+    # Workers use the prices of this process, which they would not
+    # see if started with spawn or if the prices have been reloaded.
+    prices = pricelist.current()
+    entries = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for tasks in chunks(_tasks(books, output_dir), books_per_task):
+            in_flight.append(executor.submit(_write_invoices, tasks, prices))
+            if len(in_flight) >= max_in_flight:
+                entries.extend(in_flight.popleft().result())
+        while in_flight:
+            entries.extend(in_flight.popleft().result())
+
+    return {
+        "invoices": entries,
+        "orders": sum(entry.get("orders", 0) for entry in entries),
+        "failed": sum("error" in entry for entry in entries),
+        "seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,55 @@
+"""
+Helpers shared by the batch jobs.
+
+`chunks` splits work into tasks for worker processes, and
+`checked_file_name` vets IDs, such as customer and session IDs, that
+are used to name the files a job writes.
+"""
+
+from __future__ import annotations
+import itertools
+import os
+
+
+def chunks(iterable, chunk_size: int):
+    """
+    Splits an iterable into lists of up to `chunk_size` items.
+
+    Args:
+        iterable (Iterable): The items to split.
+        chunk_size (int): The maximum number of items per list.
+
+    Yields:
+        list: The next chunk of items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def checked_file_name(name, what: str = "Name") -> str:
+    """
+    Checks that a name can be used as a file name on its own, without
+    reaching into another directory.
+
+    Args:
+        name: The name, converted to str.
+        what (str, optional):
+        What the name is, for the error message. Default is "Name".
+
+    Returns:
+        str: The name.
+
+    Raises:
+        ValueError: If the name is empty, "." or "..", or has a path
+        separator.
+    """
+    name = str(name)
+    if not name or name in (".", "..") \
+            or os.path.basename(name) != name \
+            or (os.altsep and os.altsep in name):
+        raise ValueError(f"{what} {name!r} is not a valid file name")
+    return name
@@ -0,0 +1,336 @@
+"""Vehicle Factory benchmarks.
+
+Measures vehicle assembly for each vehicle type, `OrderManager.add_order`,
+`OrderManager.format_order` and `OrderManager.generate_invoice` at one
+or more scales, reporting throughput, latency percentiles and peak
+memory. Results are written as JSON and can be compared against a
+stored baseline; a throughput drop beyond the threshold fails the run.
+
+The start-up time of the headless entry point (`main.py --headless`)
+can be checked against a budget as well, failing the run if exceeded.
+
+Usage:
+    python benchmark.py --scales 1e3 1e4 1e5 --output results.json
+    python benchmark.py --baseline baseline.json --threshold 0.2
+    python benchmark.py --only add_order --startup-budget 0.3
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from order_manager import OrderManager
+from vehicle_factory import VehicleFactory, VehicleType
+
+# Per-operation latencies are sampled, keeping at most this many.
+MAX_LATENCY_SAMPLES = 100_000
+
+ENGINE_SIZES = {
+    VehicleType.CAR: 1600,
+    VehicleType.MOTORCYCLE: 600,
+    VehicleType.BICYCLE: None,
+}
+
+
+def _sample_order(vehicle_type: VehicleType = VehicleType.CAR) -> dict:
+    """Assembles one order of the given type."""
+    return VehicleFactory.create_vehicle(vehicle_type) \
+        .assemble_vehicle(ENGINE_SIZES[vehicle_type])
+
+
+def _order_book(size: int) -> OrderManager:
+    """Creates a quiet order manager holding `size` mixed orders."""
+    orders = [_sample_order(vehicle_type) for vehicle_type in VehicleType]
+    order_manager = OrderManager(verbose=False)
+    for index in range(size):
+        order_manager.add_order(orders[index % len(orders)])
+    return order_manager
+
+
+def prepare_assemble(vehicle_type: VehicleType):
+    """Returns a setup function for assembling vehicles of a type."""
+    def prepare(scale: int, workdir: str):
+        factory = VehicleFactory()
+        engine_size = ENGINE_SIZES[vehicle_type]
+
+        def op():
+            factory.create_vehicle(vehicle_type).assemble_vehicle(engine_size)
+        return op, scale, 1
+    return prepare
+
+
+def prepare_add_order(scale: int, workdir: str):
+    """Adds `scale` orders to an initially empty order manager."""
+    order_manager = OrderManager(verbose=False)
+    order = _sample_order()
+
+    def op():
+        order_manager.add_order(order)
+    return op, scale, 1
+
+
+def prepare_format_order(scale: int, workdir: str):
+    """Formats an order `scale` times."""
+    order_manager = OrderManager(verbose=False)
+    order = _sample_order()
+
+    def op():
+        order_manager.format_order(order, 1)
+    return op, scale, 1
+
+
+def prepare_generate_invoice(scale: int, workdir: str):
+    """Writes one invoice for an order book of `scale` orders."""
+    order_manager = _order_book(scale)
+    path = os.path.join(workdir, "invoice.txt")
+
+    def op():
+        # A fresh writer per run, so every run writes the whole book.
+        order_manager._invoice_writers.clear()
+        order_manager.generate_invoice(path)
+    return op, 1, scale
+
+
+BENCHMARKS = {
+    "assemble_car": prepare_assemble(VehicleType.CAR),
+    "assemble_motorcycle": prepare_assemble(VehicleType.MOTORCYCLE),
+    "assemble_bicycle": prepare_assemble(VehicleType.BICYCLE),
+    "add_order": prepare_add_order,
+    "format_order": prepare_format_order,
+    "generate_invoice": prepare_generate_invoice,
+}
+
+
+def _percentile(sorted_values: list, fraction: float) -> int:
+    """Returns the value below which `fraction` of the values lie."""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run_benchmark(name: str, scale: int, workdir: str,
+                  measure_memory: bool = True) -> dict:
+    """
+    Runs one benchmark at one scale.
+
+    Timing and memory are measured in separate passes, as tracing
+    allocations slows the code down considerably.
+
+    Args:
+        name (str): The name of the benchmark in `BENCHMARKS`.
+        scale (int): The number of orders to work with.
+        workdir (str): A directory for files written by the benchmark.
+        measure_memory (bool, optional):
+        Also measure peak memory. Default is True.
+
+    Returns:
+        dict: The measurements of the run.
+    """
+    prepare = BENCHMARKS[name]
+    op, repeats, items_per_op = prepare(scale, workdir)
+    stride = max(1, repeats // MAX_LATENCY_SAMPLES)
+    latencies = []
+    clock = time.perf_counter_ns
+
+    start = clock()
+    for index in range(repeats):
+        if index % stride:
+            op()
+        else:
+            before = clock()
+            op()
+            latencies.append(clock() - before)
+    elapsed = (clock() - start) / 1e9
+    latencies.sort()
+
+    result = {
+        "name": name,
+        "scale": scale,
+        "seconds": elapsed,
+        "throughput": repeats * items_per_op / elapsed if elapsed else 0.0,
+        "latency_ns": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0,
+        },
+        "peak_memory_bytes": None,
+    }
+
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            op, repeats, _ = prepare(scale, workdir)
+            for _ in range(repeats):
+                op()
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def measure_startup(runs: int = 5) -> dict:
+    """
+    Measures how long the headless entry point takes to start.
+
+    Each run starts a new interpreter for `main.py --headless --help`,
+    which imports everything a headless run needs and exits.
+
+    Args:
+        runs (int, optional): The number of runs. Default is 5.
+
+    Returns:
+        dict: The median and fastest start-up times in seconds, and
+        whether Kivy was imported.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "main.py")
+    command = [sys.executable, "-X", "importtime", script,
+               "--headless", "--help"]
+    timings = []
+    kivy_imported = False
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.run(command, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE, text=True,
+                                 check=True)
+        timings.append(time.perf_counter() - start)
+        kivy_imported |= "| kivy" in process.stderr
+    timings.sort()
+    return {
+        "median_seconds": timings[len(timings) // 2],
+        "min_seconds": timings[0],
+        "kivy_imported": kivy_imported,
+    }
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """
+    Finds benchmarks whose throughput dropped below the baseline.
+
+    Args:
+        results (list[dict]): The current measurements.
+        baseline (list[dict]): The stored measurements.
+        threshold (float):
+        The allowed relative drop in throughput, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    previous = {(entry["name"], entry["scale"]): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["name"], entry["scale"]))
+        if before is None or not before["throughput"]:
+            continue
+        change = entry["throughput"] / before["throughput"] - 1
+        if change < -threshold:
+            regressions.append(
+                f"{entry['name']} @ {entry['scale']}: throughput "
+                f"{entry['throughput']:,.0f}/s vs "
+                f"{before['throughput']:,.0f}/s ({change:+.1%})")
+    return regressions
+
+
+def _print_result(result: dict):
+    """Prints one measurement as a table row."""
+    latency = result["latency_ns"]
+    memory = result["peak_memory_bytes"]
+    memory = "-" if memory is None else f"{memory / 2**20:.1f}"
+    print(f"{result['name']:<22}{result['scale']:>10,}"
+          f"{result['throughput']:>16,.0f}"
+          f"{latency['p50']:>14,}{latency['p95']:>14,}{latency['p99']:>14,}"
+          f"{memory:>10}")
+
+
+def main(argv=None) -> int:
+    """
+    Entry point for the benchmark suite.
+
+    Args:
+        argv (list[str], optional):
+        Command line arguments. Uses sys.argv if None.
+
+    Returns:
+        int: Exit status; 1 if a regression was found, else 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark assembly, order management and invoicing.")
+    parser.add_argument("--scales", nargs="+", type=float,
+                        default=[1e3, 1e4, 1e5],
+                        help="Numbers of orders to benchmark with, "
+                             "from 1e3 to 1e7. Default: 1e3 1e4 1e5")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="Run only these benchmarks.")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="File to write the results to.")
+    parser.add_argument("--baseline",
+                        help="Results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed throughput drop against the "
+                             "baseline. Default: 0.2 (20%%)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the peak memory measurement.")
+    parser.add_argument("--startup-budget", type=float, metavar="SECONDS",
+                        help="Fail if the headless entry point takes "
+                             "longer than this to start.")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    scales = [int(scale) for scale in args.scales]
+    print(f"{'benchmark':<22}{'scale':>10}{'items/s':>16}"
+          f"{'p50 ns':>14}{'p95 ns':>14}{'p99 ns':>14}{'peak MiB':>10}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            for name in names:
+                result = run_benchmark(name, scale, workdir,
+                                       not args.no_memory)
+                _print_result(result)
+                results.append(result)
+
+    startup = None
+    failed = False
+    if args.startup_budget is not None:
+        startup = measure_startup()
+        print(f"\nheadless start-up: {startup['median_seconds']:.3f}s "
+              f"(budget {args.startup_budget:.3f}s)")
+        if startup["median_seconds"] > args.startup_budget:
+            print("REGRESSION: headless start-up exceeds its budget",
+                  file=sys.stderr)
+            failed = True
+        if startup["kivy_imported"]:
+            print("REGRESSION: headless start-up imports Kivy",
+                  file=sys.stderr)
+            failed = True
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+            "startup": startup,
+        }, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+
+# Run the benchmarks
+if __name__ == "__main__":
+    sys.exit(main())
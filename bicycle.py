@@ -1,5 +1,4 @@
 from vehicle import Vehicle
-import pricelist
 
 class Bicycle(Vehicle):
     """
@@ -12,17 +11,19 @@ class Bicycle(Vehicle):
         no_of_tires (int): Number of tires to be fitted on the bicycle.
         
     Properties:
-        chassis_cost (float): Cost of the bicycle's chassis.
-        tire_cost (float): Cost per tire for the bicycle.
+        chassis_cost (int): Cost of the bicycle's chassis.
+        tire_cost (int): Cost per tire for the bicycle.
     """
     
+    __slots__ = ()
+
     def __init__(self, no_of_tires=2):
         """
         Args:
             no_of_tires (int, optional): 
             Number of tires in the bicycle. Defaults to 2.
         """
-        self._no_of_tires = no_of_tires
+        super().__init__(no_of_tires)
     
     def get_name(self) -> str:
         """
@@ -34,24 +35,24 @@ class Bicycle(Vehicle):
         return super().get_name()
     
     @property
-    def chassis_cost(self) -> float:
+    def chassis_cost(self) -> int:
         """
         Gets the cost of the bicycle's chassis.
 
         Returns:
-            float: Cost of the chassis.
+            int: Cost of the chassis.
         """
-        return pricelist.BICYCLE_CHASSIS
+        return self.prices.BICYCLE_CHASSIS
     
     @property
-    def tire_cost(self) -> float:
+    def tire_cost(self) -> int:
         """
         Gets the cost per tire for the bicycle.
 
         Returns:
-            float: Cost per tire.
+            int: Cost per tire.
         """
-        return pricelist.BICYCLE_TIRE
+        return self.prices.BICYCLE_TIRE
     
     def assemble_vehicle(self, engine_size=None):
         """
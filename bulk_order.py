@@ -0,0 +1,395 @@
+"""Headless bulk order ingestion.
+
+Streams CSV or JSONL order files through `VehicleFactory` and
+`OrderManager` without starting the GUI. Rows are read, validated and
+assembled one at a time by a chain of generators, so the pipeline
+itself holds a single row in memory regardless of the input size.
+
+Each row names a vehicle type and, for engine powered vehicles, an
+engine size:
+
+    vehicle,engine_size
+    Car,1600
+    Bicycle,
+
+    {"vehicle": "Motorcycle", "engine_size": 125}
+
+Invalid rows are reported on stderr with their file and line number
+and skipped; the run carries on with the next row.
+
+The placed orders are kept in an `OrderManager`, so memory grows with
+the number of orders (by about 30 bytes an order with --compact). With
+--stream, orders are written to the invoice and export as they are
+assembled and only totals and statistics are kept, so memory stays
+constant however large the input.
+
+Usage:
+    python bulk_order.py orders.csv dealer_feed.jsonl --invoice
+    python bulk_order.py huge_feed.csv --stream --export orders.jsonl
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from invoice_writer import StreamingInvoice
+from money import format_sek
+from order_export import write_binary, write_csv, write_jsonl
+from order_manager import OrderManager
+from order_statistics import OrderStatistics
+from vehicle_factory import VehicleFactory, VehicleType
+from engine_powered_vehicle import (EnginePoweredVehicle, MIN_ENGINE_SIZE_CC,
+                                    MAX_ENGINE_SIZE_CC, is_valid_engine_size)
+
+
+class OrderRowError(ValueError):
+    """
+    Raised when a row of an order file cannot be turned into an order.
+
+    Attributes:
+        source (str): The file the row was read from.
+        line_no (int): The line number of the row within the file.
+    """
+
+    def __init__(self, source: str, line_no: int, message: str):
+        super().__init__(f"{source}:{line_no}: {message}")
+        self.source = source
+        self.line_no = line_no
+
+
+def detect_format(path: str) -> str:
+    """
+    Determines the format of an order file from its extension.
+
+    Args:
+        path (str): Path to the order file.
+
+    Returns:
+        str: Either "csv" or "jsonl".
+
+    Raises:
+        ValueError: If the extension is not recognized.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}, use --format")
+
+
+def read_rows(path: str, file_format: str = None):
+    """
+    Lazily reads the rows of an order file.
+
+    Args:
+        path (str): Path to the order file.
+        file_format (str, optional):
+        Either "csv" or "jsonl". Detected from the extension if None.
+
+    Yields:
+        tuple[int, dict | OrderRowError]:
+        The line number and the parsed row, or an error for lines
+        that could not be parsed at all.
+    """
+    file_format = file_format or detect_format(path)
+    with open(path, newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_no, OrderRowError(path, line_no,
+                                                 f"Invalid JSON: {error.msg}")
+                    continue
+                if not isinstance(row, dict):
+                    row = OrderRowError(path, line_no,
+                                        "Expected a JSON object")
+                yield line_no, row
+
+
+def parse_row(row: dict) -> tuple[VehicleType | str, int | None]:
+    """
+    Validates an order row and extracts the order specification.
+
+    Applies the same rules as the GUI: a known vehicle type must be
+    given, and engine powered vehicles need an engine size within the
+    legal range.
+
+    Args:
+        row (dict): A row with "vehicle" and "engine_size" fields.
+
+    Returns:
+        tuple[VehicleType | str, int | None]:
+        The vehicle type and engine size (None for vehicles without
+        an engine).
+
+    Raises:
+        ValueError: If the row does not describe a valid order.
+    """
+    name = str(row.get("vehicle") or "").strip()
+    if not name:
+        raise ValueError("Vehicle type not selected")
+    if not VehicleFactory.is_registered(name):
+        raise ValueError(f"Vehicle type {name} not recognized")
+    vehicle_type = VehicleFactory.type_key(name)
+
+    vehicle_class = VehicleFactory.vehicle_class(vehicle_type)
+    if not (isinstance(vehicle_class, type)
+            and issubclass(vehicle_class, EnginePoweredVehicle)):
+        return vehicle_type, None
+
+    engine_size = row.get("engine_size")
+    if engine_size is None or not str(engine_size).strip():
+        raise ValueError("Engine size not provided for motor vehicle")
+    # Whole numbers only, as in the GUI: 1600.9 is not rounded down.
+    if isinstance(engine_size, bool) \
+            or not isinstance(engine_size, (int, str)):
+        raise ValueError(f"Invalid engine size: {engine_size}")
+    try:
+        engine_size = int(engine_size)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid engine size: {engine_size}") from None
+    if not is_valid_engine_size(engine_size):
+        raise ValueError(
+            f"Invalid engine size: {engine_size} "
+            f"(legal sizes: {MIN_ENGINE_SIZE_CC}cc - {MAX_ENGINE_SIZE_CC}cc)")
+    return vehicle_type, engine_size
+
+
+def assemble_orders(path: str, factory: VehicleFactory,
+                    file_format: str = None):
+    """
+    Turns the rows of an order file into assembled orders.
+
+    Args:
+        path (str): Path to the order file.
+        factory (VehicleFactory): The factory used to create vehicles.
+        file_format (str, optional):
+        Either "csv" or "jsonl". Detected from the extension if None.
+
+    Yields:
+        dict | OrderRowError:
+        An assembled order, or the error for a rejected row.
+    """
+    for line_no, row in read_rows(path, file_format):
+        if isinstance(row, OrderRowError):
+            yield row
+            continue
+        try:
+            vehicle_type, engine_size = parse_row(row)
+            yield factory.assemble(vehicle_type, engine_size)
+        except ValueError as error:
+            yield OrderRowError(path, line_no, str(error))
+
+
+def ingest(paths, factory: VehicleFactory, order_manager: OrderManager,
+           file_format: str = None, on_error=None) -> tuple[int, int]:
+    """
+    Places every valid order found in the given files.
+
+    Args:
+        paths (Iterable[str]): Paths to the order files.
+        factory (VehicleFactory): The factory used to create vehicles.
+        order_manager (OrderManager): Receives the assembled orders.
+        file_format (str, optional):
+        Format of all files. Detected per file if None.
+        on_error (Callable[[OrderRowError], None], optional):
+        Called for each rejected row. Errors are logged if None.
+
+    Returns:
+        tuple[int, int]: The number of accepted and rejected rows.
+    """
+    accepted = rejected = 0
+    for path in paths:
+        for result in assemble_orders(path, factory, file_format):
+            if isinstance(result, OrderRowError):
+                rejected += 1
+                if on_error is not None:
+                    on_error(result)
+                else:
+                    logging.warning("Rejected order row: %s", result)
+            else:
+                order_manager.add_order(result)
+                accepted += 1
+    return accepted, rejected
+
+
+def stream(paths, factory: VehicleFactory, file_format: str = None,
+           on_error=None, invoice: str = None,
+           export=None) -> tuple[int, OrderStatistics]:
+    """
+    Places every valid order found in the given files without keeping
+    the orders, so memory use does not grow with the input.
+
+    Each order is added to the invoice and handed to the exporter as
+    it is assembled; only the statistics of the orders are kept.
+
+    Args:
+        paths (Iterable[str]): Paths to the order files.
+        factory (VehicleFactory): The factory used to create vehicles.
+        file_format (str, optional):
+        Format of all files. Detected per file if None.
+        on_error (Callable[[OrderRowError], None], optional):
+        Called for each rejected row. Errors are logged if None.
+        invoice (str, optional): Write an invoice to this file.
+        export (Callable[[Iterable[dict]], int], optional):
+        Consumes the orders, e.g. writing them with `write_jsonl`.
+
+    Returns:
+        tuple[int, OrderStatistics]:
+        The number of rejected rows and the statistics of the orders
+        placed.
+    """
+    statistics = OrderStatistics()
+    rejected = 0
+
+    def placed(invoice_file):
+        nonlocal rejected
+        for path in paths:
+            for result in assemble_orders(path, factory, file_format):
+                if isinstance(result, OrderRowError):
+                    rejected += 1
+                    if on_error is not None:
+                        on_error(result)
+                    else:
+                        logging.warning("Rejected order row: %s", result)
+                    continue
+                statistics.add(result)
+                if invoice_file is not None:
+                    invoice_file.add(result)
+                yield result
+
+    def run(invoice_file=None):
+        if export is not None:
+            export(placed(invoice_file))
+        else:
+            for _ in placed(invoice_file):
+                pass
+
+    if invoice is None:
+        run()
+    else:
+        with StreamingInvoice(invoice, OrderManager.format_order) as file:
+            run(file)
+    return rejected, statistics
+
+
+def main(argv=None) -> int:
+    """
+    Entry point for headless bulk order ingestion.
+
+    Args:
+        argv (list[str], optional):
+        Command line arguments. Uses sys.argv if None.
+
+    Returns:
+        int: Exit status; 1 if any row was rejected, else 0.
+    """
+    parser = argparse.ArgumentParser(
+        description="Place orders in bulk from CSV or JSONL files.")
+    parser.add_argument("paths", nargs="+", metavar="FILE",
+                        help="Order files to ingest.")
+    parser.add_argument("--format", choices=("csv", "jsonl"),
+                        dest="file_format",
+                        help="Format of the files. "
+                             "Detected from the extension by default.")
+    parser.add_argument("--plugins", metavar="DIR",
+                        help="Load extra vehicle types from installed "
+                             "plugins and the plugin files in DIR.")
+    parser.add_argument("--quote-cache", type=int, default=0,
+                        metavar="SIZE",
+                        help="Memoize up to SIZE distinct quotes.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Keep the order book in a compact columnar "
+                             "store to reduce memory use.")
+    parser.add_argument("--invoice", action="store_true",
+                        help="Generate an invoice once all files are read.")
+    parser.add_argument("--export", metavar="PATH",
+                        help="Write the orders to PATH as JSONL, CSV or "
+                             "binary records, by its extension "
+                             "(.jsonl, .csv or .bin).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write the invoice and export as orders are "
+                             "placed, keeping only totals, so memory use "
+                             "does not grow with the input.")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Time each stage and write the figures to "
+                             "PATH in the Prometheus text format.")
+    args = parser.parse_args(argv)
+    exporters = {".jsonl": write_jsonl, ".csv": write_csv,
+                 ".bin": write_binary}
+    export = None
+    if args.export:
+        export = exporters.get(os.path.splitext(args.export)[1].lower())
+        if export is None:
+            parser.error("--export needs a .jsonl, .csv or .bin file")
+    # Compact stores and binary files only hold the built-in vehicles.
+    if args.plugins and args.compact:
+        parser.error("--compact cannot be combined with --plugins")
+    if args.plugins and export is write_binary:
+        parser.error("binary exports cannot be combined with --plugins")
+    if args.stream and args.compact:
+        parser.error("--stream keeps no orders; drop --compact")
+
+    if args.metrics:
+        import instrumentation
+        instrumentation.install()
+
+    def report(error: OrderRowError):
+        print(error, file=sys.stderr)
+
+    if args.plugins:
+        VehicleFactory.load_plugins(args.plugins)
+    factory = VehicleFactory(quote_cache_size=args.quote_cache)
+    if args.stream:
+        try:
+            rejected, statistics = stream(
+                args.paths, factory, args.file_format, on_error=report,
+                invoice="invoice.txt" if args.invoice else None,
+                export=(lambda orders: export(orders, args.export))
+                if export is not None else None)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 2
+        print(f"Orders placed: {statistics.count()}")
+        print(f"Rows rejected: {rejected}")
+        print("\nTotal cost of all orders: "
+              f"{format_sek(statistics.get_revenue())}")
+    else:
+        order_manager = OrderManager(verbose=False, compact=args.compact)
+        try:
+            accepted, rejected = ingest(args.paths, factory, order_manager,
+                                        args.file_format, on_error=report)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 2
+
+        print(f"Orders placed: {accepted}")
+        print(f"Rows rejected: {rejected}")
+        order_manager.print_total_cost()
+        if args.invoice:
+            order_manager.generate_invoice()
+        if export is not None:
+            try:
+                export(order_manager.iter_orders(), args.export)
+            except (OSError, ValueError) as error:
+                print(error, file=sys.stderr)
+                return 2
+    if args.metrics:
+        instrumentation.write_prometheus(args.metrics)
+    return 1 if rejected else 0
+
+
+# Run the ingestion
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,4 @@
 from engine_powered_vehicle import EnginePoweredVehicle
-import pricelist
 
 class Car(EnginePoweredVehicle):
     """
@@ -13,11 +12,13 @@ class Car(EnginePoweredVehicle):
         no_of_tires (int): Number of tires on the car.
 
     Properties:
-        chassis_cost (float): Cost of the car's chassis.
-        engine_cost (float): Cost of the car's engine.
-        tire_cost (float): Cost per tire for the car.
+        chassis_cost (int): Cost of the car's chassis.
+        engine_cost (int): Cost of the car's engine.
+        tire_cost (int): Cost per tire for the car.
     """
 
+    __slots__ = ()
+
     def __init__(self, no_of_tires=4):
         """
         Initializes a Car object with a specified number of tires.
@@ -26,7 +27,7 @@ class Car(EnginePoweredVehicle):
             no_of_tires (int, optional): 
             Number of tires on the car. Defaults to 4.
         """
-        self._no_of_tires = no_of_tires
+        super().__init__(no_of_tires)
 
     def get_name(self) -> str:
         """
@@ -41,14 +42,14 @@ class Car(EnginePoweredVehicle):
         return super().get_name()
 
     @property
-    def chassis_cost(self) -> float:
+    def chassis_cost(self) -> int:
         """
         Gets the cost of the car's chassis.
 
         Returns:
-            float: Cost of the chassis.
+            int: Cost of the chassis.
         """
-        return pricelist.CAR_CHASSIS
+        return self.prices.CAR_CHASSIS
 
     @property
     def engine_cost(self):
@@ -56,32 +57,32 @@ class Car(EnginePoweredVehicle):
         Gets the cost of the car's engine.
 
         Returns:
-            float: Cost of the engine.
+            int: Cost of the engine.
         """
         return super().engine_cost
 
     @property
-    def tire_cost(self) -> float:
+    def tire_cost(self) -> int:
         """
         Gets the cost per tire for the car.
 
         Returns:
-            float: Cost per tire.
+            int: Cost per tire.
         """
-        return pricelist.CAR_TIRE
+        return self.prices.CAR_TIRE
 
-    def calculate_engine_cost(self, size_cc: int) -> float:
+    def calculate_engine_cost(self, size_cc: int) -> int:
         """
-        Calculates the cost of the car engine based on its size.
+        Calculates the cost of the car engine based on its size,
+        using the compiled pricing rules of the car's prices.
 
         Args:
             size_cc (int): The size of the engine in cubic centimeters.
 
         Returns:
-            float: Calculated engine cost.
+            int: Calculated engine cost.
         """
-        return pricelist.CAR_ENGINE_MTRL \
-            + (pricelist.CAR_ENGINE_FIT_COEF * size_cc)
+        return self.prices.pricing.engine_cost("Car", size_cc)
 
     def assemble_vehicle(self, engine_size_cc: int):
         """
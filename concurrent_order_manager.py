@@ -0,0 +1,241 @@
+from __future__ import annotations
+from collections import deque
+from operator import itemgetter
+import itertools
+import threading
+from order_manager import OrderManager
+from order_statistics import OrderStatistics
+
+
+class _Shard:
+    """
+    The orders, running totals and statistics of one thread.
+
+    Only the owning thread writes the totals; other threads read them
+    and take orders off the `pending` deque, whose appends and pops
+    are thread-safe.
+    """
+
+    __slots__ = ("pending", "order_count", "total_cost", "statistics")
+
+    def __init__(self):
+        self.pending = deque()
+        self.order_count = 0
+        self.total_cost = 0
+        self.statistics = OrderStatistics()
+
+
+class ConcurrentOrderManager(OrderManager):
+    """
+    An OrderManager that accepts orders from many threads at once.
+
+    Each thread adding orders gets its own shard: a buffer of new
+    orders plus an order count, total cost and `OrderStatistics` that
+    only that thread updates. Adding an order therefore takes no lock
+    shared with other threads. Totals and statistics are combined over
+    the shards when read, and buffered orders are merged into the
+    order list, in the order they were placed, whenever the orders
+    themselves are read (e.g. by `iter_orders` or `generate_invoice`).
+
+    Orders placed while an invoice is being written may be counted in
+    its total without being listed; invoice when intake is paused for
+    an exact invoice.
+    """
+
+    def __init__(self, verbose: bool = True, compact: bool = False,
+                 indexed: bool = False, journal: str = None):
+        """
+        Args:
+            verbose (bool, optional):
+            Print the details of each order as it is added.
+            Default is True.
+            compact (bool, optional):
+            Keep merged orders in a `ColumnarOrderStore`.
+            Default is False.
+            indexed (bool, optional):
+            Index merged orders for `find_orders`. Default is False.
+            journal (str, optional):
+            Record every order in this journal file. Appending to the
+            journal is serialised across threads. Default is None.
+        """
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._local = threading.local()
+        self._sequence = itertools.count()
+        super().__init__(verbose=verbose, compact=compact, indexed=indexed,
+                         journal=journal)
+
+    @property
+    def total_cost(self) -> int:
+        """The total cost of all orders in öre, summed over the shards."""
+        return sum(shard.total_cost for shard in self._shards)
+
+    @total_cost.setter
+    def total_cost(self, value: int):
+        # OrderManager.__init__ starts the total at zero. The shards
+        # keep the actual totals, so there is nothing to store.
+        if value:
+            raise AttributeError("total_cost is summed from the shards")
+
+    def _new_shard(self) -> _Shard:
+        """Creates and registers the shard of the calling thread."""
+        shard = self._local.shard = _Shard()
+        with self._shards_lock:
+            self._shards = self._shards + [shard]
+        return shard
+
+    def _restore(self, snapshot: str, orders):
+        """
+        Adds recovered orders without journaling or printing them.
+
+        Args:
+            snapshot (str): The snapshot to load first, or None.
+            orders (Iterable[dict]): The orders to add after it.
+        """
+        verbose, self.verbose = self.verbose, False
+        try:
+            if snapshot is not None:
+                # Straight into the order list, counted by this thread.
+                shard = self._new_shard()
+                count, total_cost = self._load_snapshot(snapshot,
+                                                        shard.statistics)
+                shard.order_count += count
+                shard.total_cost += total_cost
+            self.add_orders(orders)
+        finally:
+            self.verbose = verbose
+
+    def add_order(self, order: dict):
+        """
+        Adds a new order to the calling thread's shard, updates its
+        total cost, records it in the journal, if any, and prints the
+        order details when verbose.
+
+        Args:
+            order (dict):
+            A dictionary containing the details of the order,
+            expected to contain keys like "TotalCost" and "Name".
+        """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        journal = self._journal
+        if journal is None:
+            shard.pending.append((next(self._sequence), order))
+        else:
+            record = journal.encode(order)
+            # Journal the orders in the order they are merged, so that
+            # a snapshot taken under the lock matches the journal.
+            with journal.lock:
+                shard.pending.append((next(self._sequence), order))
+                journal.append(record)
+                if journal.needs_snapshot():
+                    journal.start_snapshot(self._write_snapshot)
+        shard.order_count += 1
+        shard.total_cost += order["TotalCost"]
+        shard.statistics.add(order)
+        if self.verbose:
+            self._print_order_details(order)
+
+    def add_orders(self, orders):
+        """
+        Adds many orders to the calling thread's shard, as `add_order`
+        does for each in turn.
+
+        Args:
+            orders (Iterable[dict]): The orders to add, in order.
+        """
+        if self._journal is not None:
+            for order in orders:
+                self.add_order(order)
+            return
+        orders = list(orders)
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard.pending.extend(zip(self._sequence, orders))
+        shard.order_count += len(orders)
+        shard.total_cost += sum(order["TotalCost"] for order in orders)
+        for order in orders:
+            shard.statistics.add(order)
+            if self.verbose:
+                self._print_order_details(order)
+
+    def get_total_orders(self) -> int:
+        """Returns the total number of orders."""
+        return sum(shard.order_count for shard in self._shards)
+
+    def get_statistics(self) -> OrderStatistics:
+        """
+        Returns the running statistics of the orders added, merged
+        over the shards.
+
+        Returns:
+            OrderStatistics: A merged copy of the shards' statistics.
+        """
+        statistics = OrderStatistics()
+        for shard in self._shards:
+            statistics.merge(shard.statistics)
+        return statistics
+
+    def _merge(self):
+        """
+        Moves the buffered orders of all shards into the order list,
+        ordered by when they were placed.
+        """
+        with self._merge_lock:
+            merged = []
+            for shard in self._shards:
+                pending = shard.pending
+                while pending:
+                    merged.append(pending.popleft())
+            merged.sort(key=itemgetter(0))
+            orders = self._orders
+            for _, order in merged:
+                orders.append(order)
+                if self._index is not None:
+                    self._index.add(order, len(orders) - 1)
+
+    def _write_snapshot(self, path: str, count: int) -> int:
+        """
+        Merges the buffered orders, then writes the first orders to a
+        snapshot for the journal.
+
+        Args:
+            path (str): The snapshot, a binary order file.
+            count (int): The number of orders to write.
+
+        Returns:
+            int: The number of orders written.
+        """
+        self._merge()
+        return super()._write_snapshot(path, count)
+
+    def iter_orders(self, start: int = 0):
+        """
+        Iterates over the orders in the order they were added.
+
+        Args:
+            start (int, optional):
+            Index of the first order to yield. Default is 0.
+
+        Yields:
+            dict: The details of each order.
+        """
+        self._merge()
+        yield from super().iter_orders(start)
+
+    def find_orders(self, vehicle_type: str = None, min_engine_size=None,
+                    max_engine_size=None, min_cost=None,
+                    max_cost=None) -> list:
+        """
+        Finds the orders meeting all of the given criteria.
+
+        See `OrderManager.find_orders`.
+        """
+        self._merge()
+        return super().find_orders(vehicle_type, min_engine_size,
+                                   max_engine_size, min_cost, max_cost)
@@ -1,8 +1,45 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from numbers import Integral
 from vehicle import Vehicle
 import logging
 
+logger = logging.getLogger(__name__)
+
+# Legal engine sizes, in cubic centimeters, accepted when ordering.
+MIN_ENGINE_SIZE_CC = 50
+MAX_ENGINE_SIZE_CC = 8000
+
+
+def is_whole_cc(size_cc) -> bool:
+    """
+    Checks whether an engine size is a whole number of cubic
+    centimeters, so that it is priced in exact öre.
+
+    Args:
+        size_cc: The size of the engine in cubic centimeters.
+
+    Returns:
+        bool: True for integers other than bools.
+    """
+    return isinstance(size_cc, Integral) and not isinstance(size_cc, bool)
+
+
+def is_valid_engine_size(size_cc: int) -> bool:
+    """
+    Checks whether an engine of the given size can be fitted.
+
+    Args:
+        size_cc (int): The size of the engine in cubic centimeters.
+
+    Returns:
+        bool: True if the size is a whole number of cubic centimeters
+        within the legal range.
+    """
+    return is_whole_cc(size_cc) \
+        and MIN_ENGINE_SIZE_CC < size_cc <= MAX_ENGINE_SIZE_CC
+
+
 class EnginePoweredVehicle(Vehicle, ABC):
     """
     An abstract class representing a generic engine-powered vehicle.
@@ -16,7 +53,15 @@ class EnginePoweredVehicle(Vehicle, ABC):
         Engine size of the vehicle, in cubic centimeters (cc).
     """
     
-    _engine_size = None
+    __slots__ = ("_engine_size",)
+
+    def reset(self):
+        """
+        Return the vehicle to its unassembled state, removing the
+        engine.
+        """
+        super().reset()
+        self._engine_size = None
 
     @property
     def engine_cost(self):
@@ -24,12 +69,12 @@ class EnginePoweredVehicle(Vehicle, ABC):
         Calculate and return the cost of the engine.
         
         Returns:
-            float: Cost of the engine, computed based on its size.
+            int: Cost of the engine, computed based on its size.
         """
         return self.calculate_engine_cost(self._engine_size)
 
     @abstractmethod
-    def calculate_engine_cost(self, size_cc: int) -> float:
+    def calculate_engine_cost(self, size_cc: int) -> int:
         """
         Abstract method to calculate the engine cost based on its size.
         
@@ -37,7 +82,7 @@ class EnginePoweredVehicle(Vehicle, ABC):
             size_cc (int): The size of the engine in cubic centimeters.
         
         Returns:
-            float: The computed cost of the engine.
+            int: The computed cost of the engine.
         
         Note:
             This method must be implemented by all subclasses.
@@ -52,11 +97,19 @@ class EnginePoweredVehicle(Vehicle, ABC):
         Args:
             size_cc (int): 
             The size of the engine to be fitted, in cubic centimeters.
+
+        Raises:
+            ValueError: If the size is not a whole number of cubic
+            centimeters.
         """
+        if not is_whole_cc(size_cc):
+            raise ValueError(
+                f"Engine size must be a whole number of cc, got {size_cc!r}")
         engine_cost = self.calculate_engine_cost(size_cc)
         self._total_cost += engine_cost
         self._engine_size = size_cc
-        logging.info(f"New engine ({size_cc}cc) fitted")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("New engine (%scc) fitted", size_cc)
 
     def assemble_vehicle_common(self, no_of_tires: int,
                                 engine_size_cc: int):
@@ -72,8 +125,8 @@ class EnginePoweredVehicle(Vehicle, ABC):
         
         Returns:
             dict: A summary including the name of the vehicle, 
-            cost of each part, and the total cost of the 
-            assembled vehicle.
+            cost of each part, the total cost of the 
+            assembled vehicle and the size of its engine.
         """
         self.fit_chassis()
         self.fit_tires(no_of_tires)
@@ -90,5 +143,6 @@ class EnginePoweredVehicle(Vehicle, ABC):
         return {
             "Name": self.get_name(),
             "Parts": parts_and_costs,
-            "TotalCost": self.total_cost
+            "TotalCost": self.total_cost,
+            "EngineSize": engine_size_cc
         }
\ No newline at end of file
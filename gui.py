@@ -1,7 +1,13 @@
 from order_manager import OrderManager
 from vehicle_factory import VehicleFactory
 from vehicle_factory import VehicleType
+from engine_powered_vehicle import is_valid_engine_size
+from money import format_sek
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import threading
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.dropdown import DropDown
@@ -11,10 +17,10 @@ from kivy.core.window import Window
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.uix.widget import Widget
+from logging_setup import configure_logging
 import logging
 
-logging.basicConfig(filename='app.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging('app.log', level=logging.INFO)
 
 class MainApp(App):
     """Main Application Class
@@ -24,6 +30,10 @@ class MainApp(App):
     employs the `VehicleFactory` and `OrderManager` classes 
     to process orders and managing diffrent states.
     
+    Placing orders and generating invoices run one at a time on a 
+    background worker, so the window stays responsive. Their results
+    are posted back to the UI through `Clock` callbacks.
+    
     Attributes:
         factory (VehicleFactory): 
         A factory object to create vehicle instances.
@@ -44,6 +54,8 @@ class MainApp(App):
         super().__init__(**kwargs)
         self.factory = factory
         self.order_manager = order_manager
+        self._worker = ThreadPoolExecutor(max_workers=1)
+        self._invoice_cancel = None
 
     def build(self):
         """
@@ -137,16 +149,77 @@ class MainApp(App):
     
     def generate_invoice(self, instance):
         """
-        Employs the order manager to generate an invoice.
+        Employs the order manager to generate an invoice on the 
+        background worker.
+        
+        While the invoice is being written the button shows the 
+        progress, and pressing it again cancels the invoice.
         
         Args:
             instance (kivy.uix.widget.Widget): 
             The widget instance that triggered the method.
         """
-        self.order_manager.generate_invoice()
-        self.total_cost_label.text = "Invoice Generated!"
-        # Logs The Invoice generation
-        logging.info("Invoice Generated!")
+        if self._invoice_cancel is not None:
+            # Invoice in progress, the press cancels it.
+            self._invoice_cancel.set()
+            logging.info("Invoice cancelled.")
+            return
+
+        cancel = self._invoice_cancel = threading.Event()
+        self.generate_invoice_button.text = "Cancel Invoice"
+
+        def progress(written: int, total: int):
+            Clock.schedule_once(
+                partial(self._on_invoice_progress, written, total))
+
+        future = self._worker.submit(
+            self.order_manager.generate_invoice, progress=progress,
+            cancel=cancel)
+        future.add_done_callback(
+            lambda future: Clock.schedule_once(
+                partial(self._on_invoice_done, future)))
+
+    def _on_invoice_progress(self, written: int, total: int, dt):
+        """
+        Shows the progress of the invoice being generated.
+        
+        Args:
+            written (int): Orders written to the invoice so far.
+            total (int): Orders to be written to the invoice.
+            dt (float): Time elapsed since scheduling, from `Clock`.
+        """
+        if self._invoice_cancel is not None and total:
+            percent = int(100 * written / total)
+            self.generate_invoice_button.text = \
+                f"Cancel Invoice ({percent}%)"
+
+    def _on_invoice_done(self, future, dt):
+        """
+        Updates the UI once the invoice is generated or cancelled.
+        
+        Args:
+            future (concurrent.futures.Future): 
+            The finished invoice job.
+            dt (float): Time elapsed since scheduling, from `Clock`.
+        """
+        cancelled = self._invoice_cancel.is_set()
+        self._invoice_cancel = None
+        self.generate_invoice_button.text = "Generate Invoice"
+
+        error = future.exception()
+        if error is not None:
+            logging.error('Error occurred while generating invoice: %s',
+                          str(error))
+            self.show_popup(
+                'Error',
+                'An error occurred while generating the invoice. '
+                'Please try again.')
+        elif cancelled:
+            self.total_cost_label.text = "Invoice Cancelled"
+        else:
+            self.total_cost_label.text = "Invoice Generated!"
+            # Logs The Invoice generation
+            logging.info("Invoice Generated!")
 
     def on_select(self, instance, vehicle:str):
         """
@@ -203,7 +276,7 @@ class MainApp(App):
         
         engine_size = None if self.engine_input.disabled else int(self.engine_input.text)
         
-        if engine_size is not None and (engine_size <= 50 or engine_size > 8000):
+        if engine_size is not None and not is_valid_engine_size(engine_size):
             # Logs invalid engine size inputs
             logging.warning('Invalid engine size selected: %s', engine_size)
             self.show_popup('Input Error', 
@@ -211,30 +284,72 @@ class MainApp(App):
                             \nLegal sizes: [50cc - 8000cc]')
             return
 
-        try:
-            # Create a vehicle and assemble it with the given engine size, 
-            # then add the order to the order manager and update total cost.
-            vehicle = self.factory.create_vehicle(vehicle_type)
-            order = vehicle.assemble_vehicle(engine_size)
-            self.order_manager.add_order(order)
-
-            self.total_cost_label.text = \
-                f"Total Cost: {self.order_manager.get_total_cost()}"
+        future = self._worker.submit(self._assemble_order, vehicle_type,
+                                     engine_size)
+        future.add_done_callback(
+            lambda future: Clock.schedule_once(
+                partial(self._on_order_placed, future)))
 
-            # After placing an order, the order window 
-            # resets and is ready for additional orders.
-            self.engine_input.text = ""
-            
-            # Logging of successful order placement
-            logging.info('Order placed successfully.')  
+    def _assemble_order(self, vehicle_type: VehicleType,
+                        engine_size: int) -> int:
+        """
+        Create a vehicle and assemble it with the given engine size, 
+        then add the order to the order manager.
+        
+        Runs on the background worker.
+        
+        Args:
+            vehicle_type (VehicleType): The type of vehicle to order.
+            engine_size (int): The engine size, None for bicycles.
+        
+        Returns:
+            int: The total cost of all orders after this one, less
+            any volume discount, in öre.
+        """
+        vehicle = self.factory.create_vehicle(vehicle_type)
+        order = vehicle.assemble_vehicle(engine_size)
+        self.order_manager.add_order(order)
+        return (self.order_manager.get_total_cost()
+                - self.order_manager.get_volume_discount())
 
-        except Exception as error:
+    def _on_order_placed(self, future, dt):
+        """
+        Updates the total cost, or reports the error, once an order 
+        has been placed.
+        
+        Args:
+            future (concurrent.futures.Future): 
+            The finished order job.
+            dt (float): Time elapsed since scheduling, from `Clock`.
+        """
+        error = future.exception()
+        if error is not None:
             # Logs the exception details 
             # Also interacts with the uses via Pop-Up message.
             logging.error('Error occurred while placing order: %s', str(error))
             self.show_popup(
                 'Error', 
                 'An error occurred while placing the order. Please try again.')
+            return
+
+        self.total_cost_label.text = \
+            f"Total Cost: {format_sek(future.result())}"
+
+        # After placing an order, the order window 
+        # resets and is ready for additional orders.
+        self.engine_input.text = ""
+        
+        # Logging of successful order placement
+        logging.info('Order placed successfully.')  
+
+    def on_stop(self):
+        """
+        Cancels any invoice in progress and waits for the background 
+        worker to finish its remaining jobs before the app closes.
+        """
+        if self._invoice_cancel is not None:
+            self._invoice_cancel.set()
+        self._worker.shutdown(wait=True)
 
     def show_popup(self, title: str, message: str):
         """
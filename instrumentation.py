@@ -0,0 +1,251 @@
+"""
+Per-stage timing instrumentation.
+
+When installed, the main stages of placing an order (fitting parts,
+assembly, vehicle creation, adding orders and invoicing) are wrapped
+with timers that count calls and errors and record latencies in
+histograms. The figures can be read in-process with `snapshot()` or
+written in the Prometheus text format with `write_prometheus()`.
+
+Nothing is wrapped until `install()` is called, and `uninstall()`
+restores the original methods, so instrumentation costs nothing while
+it is off.
+
+Usage:
+>>> install()
+>>> ...  # place orders
+>>> write_prometheus("vehicle_factory.prom")
+"""
+
+from __future__ import annotations
+import bisect
+import functools
+import os
+import threading
+import time
+from concurrent_order_manager import ConcurrentOrderManager
+from engine_powered_vehicle import EnginePoweredVehicle
+from order_manager import OrderManager
+from vehicle import Vehicle
+from vehicle_factory import VehicleFactory
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0)
+
+# The instrumented methods, as (class, method name, stage name).
+STAGES = (
+    (Vehicle, "fit_chassis", "fit_chassis"),
+    (Vehicle, "fit_tires", "fit_tires"),
+    (EnginePoweredVehicle, "fit_engine", "fit_engine"),
+    (Vehicle, "assemble_vehicle_common", "assemble_vehicle_common"),
+    (EnginePoweredVehicle, "assemble_vehicle_common",
+     "assemble_vehicle_common"),
+    (VehicleFactory, "create_vehicle", "create_vehicle"),
+    (OrderManager, "add_order", "add_order"),
+    (ConcurrentOrderManager, "add_order", "add_order"),
+    (OrderManager, "generate_invoice", "generate_invoice"),
+)
+
+METRIC_PREFIX = "vehicle_factory_stage"
+
+
+class StageMetrics:
+    """
+    Call counts, error counts and a latency histogram for one stage.
+
+    Attributes:
+        calls (int): The number of calls, including failed ones.
+        errors (int): The number of calls that raised an exception.
+        total_seconds (float): The summed duration of all calls.
+        buckets (list[int]):
+        The number of calls per histogram bucket (not cumulative),
+        with a final bucket for calls slower than the last bound.
+    """
+
+    __slots__ = ("calls", "errors", "total_seconds", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+
+class Metrics:
+    """A thread-safe registry of `StageMetrics` by stage name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage: str, seconds: float, failed: bool = False):
+        """
+        Records one call of a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            seconds (float): How long the call took.
+            failed (bool, optional): Whether the call raised.
+        """
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            metrics = self._stages.get(stage)
+            if metrics is None:
+                metrics = self._stages[stage] = StageMetrics()
+            metrics.calls += 1
+            metrics.errors += failed
+            metrics.total_seconds += seconds
+            metrics.buckets[bucket] += 1
+
+    def reset(self):
+        """Discards all recorded figures."""
+        with self._lock:
+            self._stages.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the figures recorded so far.
+
+        Returns:
+            dict: For each stage, a dict with "calls", "errors",
+            "total_seconds" and "buckets", the latter mapping each
+            bucket's upper bound (float("inf") for the last) to its
+            cumulative count.
+        """
+        bounds = BUCKETS + (float("inf"),)
+        with self._lock:
+            stages = {}
+            for stage, metrics in self._stages.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(bounds, metrics.buckets):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                stages[stage] = {
+                    "calls": metrics.calls,
+                    "errors": metrics.errors,
+                    "total_seconds": metrics.total_seconds,
+                    "buckets": buckets,
+                }
+            return stages
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the figures in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        stages = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_errors_total "
+            "Calls of each stage that raised an exception.",
+            f"# TYPE {METRIC_PREFIX}_errors_total counter",
+        ]
+        for stage, figures in stages.items():
+            lines.append(f'{METRIC_PREFIX}_errors_total{{stage="{stage}"}} '
+                         f'{figures["errors"]}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_duration_seconds "
+            "Duration of each stage.",
+            f"# TYPE {METRIC_PREFIX}_duration_seconds histogram",
+        ]
+        for stage, figures in stages.items():
+            for bound, count in figures["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{METRIC_PREFIX}_duration_seconds_bucket'
+                             f'{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_duration_seconds_sum'
+                         f'{{stage="{stage}"}} {figures["total_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_duration_seconds_count'
+                         f'{{stage="{stage}"}} {figures["calls"]}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+_originals = []
+
+
+def _timed(stage: str, function):
+    """
+    Wraps a function so that each call is recorded under `stage`.
+
+    Args:
+        stage (str): The name of the stage.
+        function (Callable): The function to time.
+
+    Returns:
+        Callable: The timed function.
+    """
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            METRICS.observe(stage, clock() - start, failed)
+    return timed
+
+
+def is_installed() -> bool:
+    """Returns whether the instrumentation is installed."""
+    return bool(_originals)
+
+
+def install():
+    """
+    Wraps the instrumented methods with timers.
+
+    Calling it again while installed has no effect.
+    """
+    if _originals:
+        return
+    for cls, name, stage in STAGES:
+        original = cls.__dict__[name]
+        if isinstance(original, staticmethod):
+            wrapped = staticmethod(_timed(stage, original.__func__))
+        else:
+            wrapped = _timed(stage, original)
+        _originals.append((cls, name, original))
+        setattr(cls, name, wrapped)
+
+
+def uninstall():
+    """Restores the original, untimed methods."""
+    while _originals:
+        cls, name, original = _originals.pop()
+        setattr(cls, name, original)
+
+
+def snapshot() -> dict:
+    """
+    Returns the figures recorded so far.
+
+    Returns:
+        dict: See `Metrics.snapshot`.
+    """
+    return METRICS.snapshot()
+
+
+def write_prometheus(path: str):
+    """
+    Writes the recorded figures to a Prometheus text-format file.
+
+    The file is replaced atomically, so a collector reading it never
+    sees a partial write.
+
+    Args:
+        path (str): The file to write.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(METRICS.to_prometheus())
+    os.replace(temp_path, path)
@@ -0,0 +1,234 @@
+from __future__ import annotations
+import os
+from money import format_sek
+from pricelist import volume_discount
+
+
+def format_totals(total_cost: int, quantity: int, pricing=None) -> str:
+    """
+    Formats the closing lines of an invoice: the total and, when the
+    number of vehicles qualifies for one, the volume discount.
+
+    Args:
+        total_cost (int): The undiscounted cost of the orders, in öre.
+        quantity (int): The number of vehicles ordered.
+        pricing (CompiledPricing, optional):
+        The pricing rules to take the discount from. Defaults to
+        those of the current prices.
+
+    Returns:
+        str: The lines, starting with a blank one.
+    """
+    discount = volume_discount(total_cost, quantity) if pricing is None \
+        else pricing.discount(total_cost, quantity)
+    if not discount:
+        return f"\nTotal Cost: {format_sek(total_cost)}\n"
+    return (f"\nSubtotal: {format_sek(total_cost)}\n"
+            f"Volume discount ({quantity} vehicles): "
+            f"-{format_sek(discount)}\n"
+            f"Total Cost: {format_sek(total_cost - discount)}\n")
+
+
+class InvoiceWriter:
+    """
+    Writes the invoice of an order manager to a text file, appending
+    only the orders added since the previous write.
+
+    The writer remembers how many orders it has written and where the
+    closing total begins. On the next write the old total is cut off,
+    the new orders are appended and a fresh total is written, so
+    repeated invoicing costs O(new orders) rather than O(all orders).
+    If the file was changed or removed by someone else in between,
+    the invoice is written again from scratch.
+
+    Attributes:
+        path (str): The file the invoice is written to.
+        chunk_size (int):
+        Approximate number of characters gathered before each write.
+    """
+
+    HEADER = "           INVOICE\n================================\n"
+
+    def __init__(self, path: str = "invoice.txt", chunk_size: int = 1 << 16):
+        """
+        Args:
+            path (str, optional):
+            The file to write the invoice to. Default is "invoice.txt".
+            chunk_size (int, optional):
+            Approximate number of characters per write. Default is 64k.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self._orders_written = 0
+        self._body_end = None
+        self._file_signature = None
+
+    @property
+    def orders_written(self) -> int:
+        """Returns the number of orders currently in the invoice file."""
+        return self._orders_written
+
+    def _signature(self):
+        """Returns the size and modification time of the invoice file."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _can_append(self, order_count: int) -> bool:
+        """
+        Checks whether the file on disk is still the one last written.
+
+        Args:
+            order_count (int): Number of orders in the order manager.
+        """
+        return (self._body_end is not None
+                and order_count >= self._orders_written
+                and self._signature() == self._file_signature)
+
+    def write(self, order_manager, progress=None, cancel=None) -> int:
+        """
+        Brings the invoice file up to date with the order manager.
+
+        If cancelled, the orders written so far are kept but the total
+        is left out; the next call carries on where this one stopped.
+
+        Args:
+            order_manager (OrderManager):
+            The order manager whose orders are invoiced.
+            progress (Callable[[int, int], None], optional):
+            Called after each chunk with the number of orders in the
+            invoice so far and the number of orders to invoice.
+            cancel (threading.Event, optional):
+            Stops the write after the current chunk once set.
+
+        Returns:
+            int: The number of orders written by this call.
+        """
+        order_count = order_manager.get_total_orders()
+        if self._can_append(order_count):
+            file = open(self.path, "r+", buffering=self.chunk_size)
+            file.seek(self._body_end)
+            file.truncate()
+        else:
+            file = open(self.path, "w", buffering=self.chunk_size)
+            file.write(self.HEADER)
+            self._orders_written = 0
+
+        start = self._orders_written
+        with file:
+            chunk = []
+            chunk_length = 0
+            for index, order in enumerate(
+                    order_manager.iter_orders(start), start + 1):
+                text = order_manager.format_order(order, index)
+                chunk.append(text)
+                chunk_length += len(text)
+                self._orders_written = index
+                if chunk_length >= self.chunk_size:
+                    file.write(''.join(chunk))
+                    chunk.clear()
+                    chunk_length = 0
+                    if progress is not None:
+                        progress(index, order_count)
+                    if cancel is not None and cancel.is_set():
+                        break
+            file.write(''.join(chunk))
+
+            self._body_end = file.tell()
+            if cancel is None or not cancel.is_set():
+                file.write(
+                    format_totals(order_manager.get_total_cost(),
+                                  order_manager.get_total_orders()))
+                if progress is not None:
+                    progress(self._orders_written, order_count)
+
+        self._file_signature = self._signature()
+        return self._orders_written - start
+
+
+class StreamingInvoice:
+    """
+    Writes an invoice as orders pass through, without keeping them,
+    for order streams too large to hold in an `OrderManager`.
+
+    Use as a context manager. The invoice is written to a temporary
+    file and renamed into place, with its total, when the block ends
+    without an error, and discarded otherwise.
+
+    Usage:
+    >>> with StreamingInvoice("invoice.txt", OrderManager.format_order) \\
+    ...         as invoice:
+    ...     for order in orders:
+    ...         invoice.add(order)
+
+    Attributes:
+        path (str): The file the invoice is written to.
+        orders_written (int): The number of orders in the invoice.
+        total_cost (int): The total cost of those orders, in öre.
+        pricing (CompiledPricing):
+        The pricing rules the volume discount is taken from, or None
+        for those of the current prices.
+    """
+
+    def __init__(self, path: str, format_order, chunk_size: int = 1 << 16,
+                 pricing=None):
+        """
+        Args:
+            path (str): The file to write the invoice to.
+            format_order (Callable[[dict, int], str]):
+            Formats an order and its number, e.g.
+            `OrderManager.format_order`.
+            chunk_size (int, optional):
+            Approximate number of characters per write. Default is 64k.
+            pricing (CompiledPricing, optional):
+            The pricing rules to take the volume discount from.
+            Defaults to those of the current prices.
+        """
+        self.path = path
+        self.format_order = format_order
+        self.chunk_size = chunk_size
+        self.pricing = pricing
+        self.orders_written = 0
+        self.total_cost = 0
+        self._file = None
+        self._chunk = []
+        self._chunk_length = 0
+
+    def __enter__(self) -> StreamingInvoice:
+        self._file = open(f"{self.path}.tmp", "w")
+        self._file.write(InvoiceWriter.HEADER)
+        return self
+
+    def add(self, order: dict):
+        """
+        Adds an order to the invoice.
+
+        Args:
+            order (dict): The details of the order.
+        """
+        self.orders_written += 1
+        self.total_cost += order["TotalCost"]
+        text = self.format_order(order, self.orders_written)
+        self._chunk.append(text)
+        self._chunk_length += len(text)
+        if self._chunk_length >= self.chunk_size:
+            self._file.write(''.join(self._chunk))
+            self._chunk.clear()
+            self._chunk_length = 0
+
+    def __exit__(self, exc_type, *exc_info):
+        temp_path = self._file.name
+        try:
+            if exc_type is None:
+                self._file.write(''.join(self._chunk))
+                self._file.write(format_totals(self.total_cost,
+                                               self.orders_written,
+                                               self.pricing))
+            self._file.close()
+            if exc_type is None:
+                os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,109 @@
+"""
+Logging configuration for the application.
+
+By default records are handed to a background thread through a queue,
+so the code that logs (e.g. the vehicle assembly hot path) never waits
+on file I/O. Routine records can optionally be sampled, keeping only
+one in every N; warnings and errors are always kept.
+
+Usage:
+>>> configure_logging("app.log", sample_every=100)
+"""
+
+from __future__ import annotations
+import atexit
+import itertools
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through one in every `every` records at or below `level`.
+
+    Records above `level` always pass.
+
+    Attributes:
+        every (int): Keep one record out of this many.
+        level (int): The highest level that is sampled.
+    """
+
+    def __init__(self, every: int, level: int = logging.INFO):
+        """
+        Args:
+            every (int): Keep one record out of this many.
+            level (int, optional):
+            The highest level that is sampled. Default is INFO.
+        """
+        super().__init__()
+        self.every = every
+        self.level = level
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        return next(self._counter) % self.every == 0
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves formatting to the background writer.
+
+    The standard handler formats each message before queueing it,
+    which keeps that cost on the logging thread. Within one process
+    the record can be queued as-is instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(filename: str = 'app.log',
+                      level: int = logging.INFO,
+                      background: bool = True,
+                      sample_every: int = 1) -> QueueListener | None:
+    """
+    Configures the root logger to write to a file.
+
+    Args:
+        filename (str, optional):
+        The log file to write to. Default is 'app.log'.
+        level (int, optional):
+        The lowest level that is logged. Messages below it are skipped
+        before they are built. Default is INFO.
+        background (bool, optional):
+        Write records on a background thread. Default is True.
+        sample_every (int, optional):
+        Keep one in every N records at INFO level and below.
+        Default is 1, keeping all.
+
+    Returns:
+        QueueListener | None:
+        The listener running the background writer, or None when
+        writing in the foreground. It is stopped, flushing any queued
+        records, when the interpreter exits.
+    """
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    listener = None
+    if background:
+        log_queue = queue.SimpleQueue()
+        handler = _DeferredQueueHandler(log_queue)
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+    else:
+        handler = file_handler
+
+    if sample_every > 1:
+        handler.addFilter(SamplingFilter(sample_every))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    return listener
@@ -1,25 +1,45 @@
 """Vehicle Factory"""
 
 from __future__ import annotations
+import sys
 from order_manager import OrderManager
 from vehicle_factory import VehicleFactory
-from gui import MainApp
-from engine_powered_vehicle import EnginePoweredVehicle
 
-def main():
+def main(argv=None):
     """
     Entry point for the vehicle ordering application.
-    
-    Initializes the Vehicle Factory and Order Manager, 
-    then starts the Kivy application using these for the 
+
+    Initializes the Vehicle Factory and Order Manager,
+    then starts the Kivy application using these for the
     backend logic.
+
+    With --headless as the first argument no window is opened and
+    Kivy is never imported; the remaining arguments are handled by
+    the bulk order ingestion (see bulk_order.py), e.g.:
+
+        python main.py --headless orders.csv --invoice
+
+    Args:
+        argv (list[str], optional):
+        Command line arguments. Uses sys.argv if None.
+
+    Returns:
+        int: Exit status of a headless run, None for the GUI.
     """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--headless":
+        import bulk_order
+        return bulk_order.main(argv[1:])
+
+    # Imported here, as Kivy is slow to import and opens a window.
+    from gui import MainApp
+
     factory = VehicleFactory()
     order_manager = OrderManager()
 
     app = MainApp(factory=factory, order_manager=order_manager)
     app.run()
 
-# Run the application       
+# Run the application
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
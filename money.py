@@ -0,0 +1,69 @@
+"""
+Money amounts.
+
+All costs are held as integers counting öre, the minor unit of the
+Swedish krona (1 SEK = 100 öre), so that sums over any number of
+orders are exact and can be computed with int64 arrays. Amounts are
+converted to SEK only when shown to people, with `format_sek`, or
+when read from people, with `to_ore`.
+"""
+
+from __future__ import annotations
+from decimal import Decimal, InvalidOperation
+
+ORE_PER_SEK = 100
+
+
+def to_ore(sek) -> int:
+    """
+    Converts an amount in SEK to öre, exactly.
+
+    Args:
+        sek (int | float | str | Decimal): The amount in SEK, e.g. 59.5.
+
+    Returns:
+        int: The amount in öre, e.g. 5950.
+
+    Raises:
+        ValueError:
+        If the amount is not a number or has fractions of an öre.
+    """
+    if isinstance(sek, bool):
+        raise ValueError(f"Amount {sek!r} is not a number")
+    try:
+        # Through str, so that 59.5 is taken as written rather than as
+        # its nearest binary fraction.
+        ore = Decimal(str(sek)) * ORE_PER_SEK
+    except InvalidOperation:
+        raise ValueError(f"Amount {sek!r} is not a number") from None
+    if not ore.is_finite() or ore != ore.to_integral_value():
+        raise ValueError(f"Amount {sek!r} is not a whole number of öre")
+    return int(ore)
+
+
+def to_sek(ore: int) -> Decimal:
+    """
+    Converts an amount in öre to SEK, exactly.
+
+    Args:
+        ore (int): The amount in öre.
+
+    Returns:
+        Decimal: The amount in SEK, with two decimals.
+    """
+    return Decimal(ore).scaleb(-2)
+
+
+def format_sek(ore: int) -> str:
+    """
+    Formats an amount in öre for display.
+
+    Args:
+        ore (int): The amount in öre, e.g. 32250050.
+
+    Returns:
+        str: The amount in SEK, e.g. "322500.50 SEK".
+    """
+    sign = "-" if ore < 0 else ""
+    kronor, ore = divmod(abs(int(ore)), ORE_PER_SEK)
+    return f"{sign}{kronor}.{ore:02d} SEK"
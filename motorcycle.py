@@ -1,5 +1,4 @@
 from engine_powered_vehicle import EnginePoweredVehicle
-import pricelist
 
 
 class Motorcycle(EnginePoweredVehicle):
@@ -10,6 +9,8 @@ class Motorcycle(EnginePoweredVehicle):
         no_of_tires (int): Number of tires on the motorcycle.
     """
 
+    __slots__ = ()
+
     def __init__(self, no_of_tires=2):
         """
         Initializes a new instance of the Motorcycle class.
@@ -18,7 +19,7 @@ class Motorcycle(EnginePoweredVehicle):
             no_of_tires (int): 
             Number of tires for the motorcycle. Default is 2.
         """
-        self._no_of_tires = no_of_tires
+        super().__init__(no_of_tires)
 
     def get_name(self) -> str:
         """
@@ -40,39 +41,39 @@ class Motorcycle(EnginePoweredVehicle):
         return super().engine_cost
     
     @property
-    def chassis_cost(self) -> float:
+    def chassis_cost(self) -> int:
         """
         Retrieves the cost of the motorcycle's chassis.
 
         Returns:
-            float: Cost of the motorcycle chassis.
+            int: Cost of the motorcycle chassis.
         """
-        return pricelist.MOTORCYCLE_CHASSIS
+        return self.prices.MOTORCYCLE_CHASSIS
     
     @property
-    def tire_cost(self) -> float:
+    def tire_cost(self) -> int:
         """
         Retrieves the cost of a single motorcycle tire.
 
         Returns:
-            float: Cost of a motorcycle tire.
+            int: Cost of a motorcycle tire.
         """
-        return pricelist.MOTORCYCLE_TIRE
+        return self.prices.MOTORCYCLE_TIRE
     
-    def calculate_engine_cost(self, size_cc: int) -> float:
+    def calculate_engine_cost(self, size_cc: int) -> int:
         """
         Calculates the cost to manufacture and fit an engine of the
-        given size.
+        given size, using the compiled pricing rules of the
+        motorcycle's prices.
 
         Args:
             size_cc (int): 
             The size of the engine in cubic centimeters (cc).
 
         Returns:
-            float: The total cost to manufacture and fit the engine.
+            int: The total cost to manufacture and fit the engine.
         """
-        return pricelist.MOTORCYCLE_ENGINE_MTRL \
-            + (pricelist.MOTORCYCLE_ENGINE_FIT_COEF * size_cc)
+        return self.prices.pricing.engine_cost("Motorcycle", size_cc)
     
     def assemble_vehicle(self, engine_size_cc: int):
         """
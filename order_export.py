@@ -0,0 +1,508 @@
+"""
+Machine-readable export of order books.
+
+Binary: the order book is written as a 16 byte header followed by one
+40 byte record per order, so that analytics jobs can map the file and
+read any field without parsing text. All integers are little-endian.
+
+    header: magic "VFOB", format version (u16), record size (u16),
+            number of records (u64)
+    record: vehicle type code (u8), 3 bytes padding, engine size in cc
+            (u32), chassis, tires, engine and total cost in öre (i64
+            each)
+
+Type codes are `VehicleType` values. Vehicles without an engine have
+zero engine size and engine cost.
+
+JSONL and CSV: one row per order, for systems that cannot read the
+invoice. Rows hold the order number (from 1, as in the invoice), the
+vehicle, its engine size in cc and the cost of each part and the total
+in öre:
+
+    {"order": 1, "vehicle": "Car", "engine_size": 1600,
+     "parts": {"chassis": 5000000, "tires": 1200000, "engine": 12020000},
+     "total": 18220000}
+
+    order,vehicle,engine_size,chassis,tires,engine,total
+    1,Car,1600,5000000,1200000,12020000,18220000
+
+Fields that do not apply, such as the engine of a bicycle, are null in
+JSONL and empty in CSV. Rows are produced by generators and written a
+chunk at a time, so exports of any size use bounded memory.
+
+Usage:
+>>> order_manager.export_binary("orders.bin")
+>>> orders, _ = load_numpy("orders.bin")
+>>> orders["total"].sum()
+>>> order_manager.export_csv("orders.csv")
+"""
+
+from __future__ import annotations
+import csv
+import io
+import json
+import mmap
+import os
+import struct
+from order_store import type_code, type_name
+from vehicle_factory import VehicleType
+
+MAGIC = b"VFOB"
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<4sHHQ")
+RECORD = struct.Struct("<B3xIqqqq")
+
+# Field names and offsets of a record, for structured array readers.
+FIELDS = (
+    ("type_code", "u1", 0),
+    ("engine_size", "<u4", 4),
+    ("chassis", "<i8", 8),
+    ("tires", "<i8", 16),
+    ("engine", "<i8", 24),
+    ("total", "<i8", 32),
+)
+
+# Records packed per write.
+_RECORDS_PER_CHUNK = 4096
+
+# The parts of an order, in order, as unpacked from a record.
+_PARTS = ("Chassis", "Tires")
+_ENGINE_PARTS = ("Chassis", "Tires", "Engine")
+
+
+def _pack(order) -> bytes:
+    """Packs an order into one record."""
+    parts = order.get("Parts") or {}
+    return RECORD.pack(type_code(order["Name"]),
+                       order.get("EngineSize") or 0,
+                       parts.get("Chassis", 0), parts.get("Tires", 0),
+                       parts.get("Engine", 0), order["TotalCost"])
+
+
+def _unpack(record: tuple, names: dict = None) -> dict:
+    """
+    Turns a record, as unpacked, back into an order, taking vehicle
+    names from `names` by type code if given.
+    """
+    code, engine_size, chassis, tires, engine, total = record
+    order = {
+        "Name": (names or {}).get(code) or type_name(code),
+        "Parts": {"Chassis": chassis, "Tires": tires},
+        "TotalCost": total,
+    }
+    if engine_size:
+        order["Parts"]["Engine"] = engine
+        order["EngineSize"] = engine_size
+    return order
+
+
+def _type_names() -> dict:
+    """Returns the vehicle name of each type code."""
+    return {vehicle_type.value: type_name(vehicle_type.value)
+            for vehicle_type in VehicleType}
+
+
+def pack_records(orders) -> bytes:
+    """
+    Packs orders into records, without a header, e.g. to hand them to
+    another process far more cheaply than pickled dicts.
+
+    Only orders that `unpack_records` gives back unchanged are packed:
+    built-in vehicles with their chassis, tires and, if they have an
+    engine size, engine, in that order.
+
+    Args:
+        orders (Iterable[dict]): The orders to pack.
+
+    Returns:
+        bytes: One record per order.
+
+    Raises:
+        ValueError: If an order names a vehicle type without a code or
+        has other parts.
+        struct.error: If a cost or engine size does not fit a record.
+    """
+    records = []
+    for order in orders:
+        if tuple(order.get("Parts") or ()) != (
+                _ENGINE_PARTS if order.get("EngineSize") else _PARTS):
+            raise ValueError(
+                f"Order of {order['Name']} does not fit a record")
+        records.append(_pack(order))
+    return b"".join(records)
+
+
+def unpack_records(data):
+    """
+    Unpacks the records made by `pack_records`.
+
+    Args:
+        data (bytes): The records.
+
+    Yields:
+        dict: Each order.
+    """
+    names = _type_names()
+    for record in RECORD.iter_unpack(data):
+        yield _unpack(record, names)
+
+
+def write_binary(orders, path: str, sync: bool = False) -> int:
+    """
+    Writes orders to a binary order file.
+
+    The file is written to a temporary name and renamed into place,
+    so readers never see a partial export.
+
+    Args:
+        orders (Iterable[dict]): The orders to export.
+        path (str): The file to write.
+        sync (bool, optional):
+        Fsync the file before renaming it. Default is False.
+
+    Returns:
+        int: The number of orders written.
+
+    Raises:
+        ValueError: If an order names a vehicle type without a code.
+    """
+    temp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, 0))
+            chunk = []
+            for order in orders:
+                chunk.append(_pack(order))
+                if len(chunk) == _RECORDS_PER_CHUNK:
+                    file.write(b"".join(chunk))
+                    count += len(chunk)
+                    chunk.clear()
+            file.write(b"".join(chunk))
+            count += len(chunk)
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, count))
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def write_columns(columns: dict, path: str, sync: bool = False) -> int:
+    """
+    Writes orders held as columns to a binary order file, e.g. those
+    of `ColumnarOrderStore.columns`, without creating any order.
+
+    As with `write_binary`, readers never see a partial export.
+
+    Args:
+        columns (dict[str, numpy.ndarray]):
+        One array per field named in `FIELDS`, all of equal length.
+        path (str): The file to write.
+        sync (bool, optional):
+        Fsync the file before renaming it. Default is False.
+
+    Returns:
+        int: The number of orders written.
+    """
+    import numpy as np
+    count = len(columns["total"])
+    chunk = np.zeros(min(count, _RECORDS_PER_CHUNK), dtype=numpy_dtype())
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size,
+                                   count))
+            for start in range(0, count, _RECORDS_PER_CHUNK):
+                end = min(start + _RECORDS_PER_CHUNK, count)
+                records = chunk[:end - start]
+                for name, _, _ in FIELDS:
+                    records[name] = columns[name][start:end]
+                file.write(records.tobytes())
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def read_header(file) -> int:
+    """
+    Reads and checks the header of a binary order file.
+
+    Args:
+        file (BinaryIO): The file, positioned at its start.
+
+    Returns:
+        int: The number of records in the file.
+
+    Raises:
+        ValueError: If the file is not a supported binary order file.
+    """
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("Not a binary order file: too short")
+    magic, version, record_size, count = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a binary order file")
+    if version != FORMAT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"Unsupported binary order file version {version}")
+    return count
+
+
+class BinaryOrderFile:
+    """
+    Memory-maps a binary order file for reading.
+
+    Records are decoded only when accessed. Use as a context manager,
+    or call `close`, to release the mapping.
+
+    Usage:
+    >>> with BinaryOrderFile("orders.bin") as orders:
+    ...     revenue = sum(record[5] for record in orders.records())
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The binary order file.
+
+        Raises:
+            ValueError: If the file is not a supported binary order
+            file or is shorter than its header says.
+        """
+        with open(path, "rb") as file:
+            self.count = read_header(file)
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size + self.count * RECORD.size:
+                raise ValueError(f"{path} is truncated")
+            # Empty files cannot be mapped.
+            self._map = b""
+            if self.count:
+                self._map = mmap.mmap(file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+
+    def records(self):
+        """
+        Iterates over the raw records without copying the file.
+
+        Yields:
+            tuple: The type code, engine size, chassis, tires, engine
+            and total cost of each order.
+        """
+        end = HEADER.size + self.count * RECORD.size
+        with memoryview(self._map) as view:
+            yield from RECORD.iter_unpack(view[HEADER.size:end])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("order index out of range")
+        return _unpack(RECORD.unpack_from(self._map,
+                                          HEADER.size + index * RECORD.size))
+
+    def __iter__(self):
+        names = _type_names()
+        for record in self.records():
+            yield _unpack(record, names)
+
+    def close(self):
+        """Releases the memory map."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self) -> BinaryOrderFile:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def numpy_dtype():
+    """
+    Returns the numpy structured dtype of one record.
+
+    Returns:
+        numpy.dtype: With the fields named in `FIELDS`.
+    """
+    import numpy as np
+    names, formats, offsets = zip(*FIELDS)
+    return np.dtype({"names": list(names), "formats": list(formats),
+                     "offsets": list(offsets), "itemsize": RECORD.size})
+
+
+def load_numpy(path: str):
+    """
+    Maps a binary order file as a read-only numpy structured array.
+
+    Args:
+        path (str): The binary order file.
+
+    Returns:
+        tuple[numpy.memmap, dict[int, str]]: The records, and the
+        vehicle name of each type code.
+
+    Raises:
+        ValueError: If the file is not a supported binary order file.
+    """
+    import numpy as np
+    with open(path, "rb") as file:
+        count = read_header(file)
+    names = {vehicle_type.value: type_name(vehicle_type.value)
+             for vehicle_type in VehicleType}
+    if not count:
+        return np.empty(0, dtype=numpy_dtype()), names
+    orders = np.memmap(path, dtype=numpy_dtype(), mode="r",
+                       offset=HEADER.size, shape=(count,))
+    return orders, names
+
+
+# Parts with a column in CSV exports, in column order.
+CSV_PARTS = ("Chassis", "Tires", "Engine")
+CSV_COLUMNS = ("order", "vehicle", "engine_size",
+               *(part.lower() for part in CSV_PARTS), "total")
+
+# Rows gathered per write of a text export.
+_ROWS_PER_CHUNK = 4096
+
+
+def iter_jsonl(orders, start: int = 1):
+    """
+    Encodes orders as JSON lines, one at a time.
+
+    Args:
+        orders (Iterable[dict]): The orders to encode.
+        start (int, optional): The number of the first order. Default is 1.
+
+    Yields:
+        str: One line per order, ending in a newline.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False,
+                              separators=(",", ":")).encode
+    for number, order in enumerate(orders, start):
+        parts = order.get("Parts") or {}
+        yield encode({
+            "order": number,
+            "vehicle": order["Name"],
+            "engine_size": order.get("EngineSize"),
+            "parts": {part.lower(): cost for part, cost in parts.items()},
+            "total": order["TotalCost"],
+        }) + "\n"
+
+
+def iter_csv(orders, start: int = 1, header: bool = True):
+    """
+    Encodes orders as CSV lines, one at a time, with the columns in
+    `CSV_COLUMNS`.
+
+    Args:
+        orders (Iterable[dict]): The orders to encode.
+        start (int, optional): The number of the first order. Default is 1.
+        header (bool, optional):
+        Begin with a line of column names. Default is True.
+
+    Yields:
+        str: The header, then one line per order.
+
+    Raises:
+        ValueError: If an order has a part without a column.
+    """
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def encode(row) -> str:
+        writer.writerow(row)
+        text = line.getvalue()
+        line.seek(0)
+        line.truncate()
+        return text
+
+    if header:
+        yield encode(CSV_COLUMNS)
+    for number, order in enumerate(orders, start):
+        parts = order.get("Parts") or {}
+        extra = set(parts).difference(CSV_PARTS)
+        if extra:
+            raise ValueError(f"Order {number} has parts without a CSV "
+                             f"column: {sorted(extra)}")
+        yield encode((number, order["Name"], order.get("EngineSize"),
+                      *(parts.get(part) for part in CSV_PARTS),
+                      order["TotalCost"]))
+
+
+def _write_text(lines, path: str) -> int:
+    """
+    Writes lines of text to a temporary file renamed into place,
+    gathering `_ROWS_PER_CHUNK` lines per write.
+
+    Returns:
+        int: The number of lines written.
+    """
+    temp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="") as file:
+            chunk = []
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) == _ROWS_PER_CHUNK:
+                    file.write("".join(chunk))
+                    count += len(chunk)
+                    chunk.clear()
+            file.write("".join(chunk))
+            count += len(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def write_jsonl(orders, path: str) -> int:
+    """
+    Writes orders to a JSONL file, see `iter_jsonl`.
+
+    As with `write_binary`, readers never see a partial export.
+
+    Args:
+        orders (Iterable[dict]): The orders to export.
+        path (str): The file to write.
+
+    Returns:
+        int: The number of orders written.
+    """
+    return _write_text(iter_jsonl(orders), path)
+
+
+def write_csv(orders, path: str) -> int:
+    """
+    Writes orders to a CSV file with a header line, see `iter_csv`.
+
+    As with `write_binary`, readers never see a partial export.
+
+    Args:
+        orders (Iterable[dict]): The orders to export.
+        path (str): The file to write.
+
+    Returns:
+        int: The number of orders written.
+
+    Raises:
+        ValueError: If an order has a part without a column.
+    """
+    return _write_text(iter_csv(orders), path) - 1
@@ -0,0 +1,329 @@
+"""
+Secondary indexes over an order book.
+
+`OrderIndex` keeps, per vehicle type, the positions of the orders
+sorted by engine size and by total cost, so that questions such as
+"all motorcycles of 600-1000cc costing over 50000 SEK" are answered by
+binary search rather than by a scan of every order.
+"""
+
+from __future__ import annotations
+import bisect
+
+_INF = float("inf")
+
+
+class SortedColumn:
+    """
+    The positions of orders sorted by one value.
+
+    Entries are kept sorted in blocks of `LOAD` to `2 * LOAD` entries,
+    with the last entry of each block and a Fenwick tree of block
+    lengths alongside. A lookup binary searches the block maxima and
+    then one block, and counts the entries before it from the tree, so
+    counting takes O(log n) and listing k entries O(log n + k). Adding
+    an entry inserts it into one block, moving at most `2 * LOAD`
+    entries, and splits the block once it is full.
+    """
+
+    __slots__ = ("_blocks", "_maxes", "_tree", "_length")
+
+    # The number of entries per block after a split or rebuild.
+    LOAD = 1000
+
+    def __init__(self):
+        self._blocks = []
+        self._maxes = []
+        self._tree = [0]
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def add(self, key: float, position: int):
+        """
+        Adds an order.
+
+        Args:
+            key (int): The value the order is sorted by.
+            position (int): The position of the order in the order book.
+        """
+        entry = (key, position)
+        blocks = self._blocks
+        if not blocks:
+            self._rebuild([entry])
+            return
+        index = bisect.bisect_right(self._maxes, entry)
+        if index == len(blocks):
+            index -= 1
+            blocks[index].append(entry)
+            self._maxes[index] = entry
+        else:
+            bisect.insort(blocks[index], entry)
+        self._length += 1
+        if len(blocks[index]) > 2 * self.LOAD:
+            self._split(index)
+        else:
+            self._grow(index)
+
+    def extend(self, entries):
+        """
+        Adds many orders at once. Large batches are merged in with one
+        sort rather than inserted one by one.
+
+        Args:
+            entries (Iterable[tuple[int, int]]):
+            The key and position of each order.
+        """
+        entries = list(entries)
+        if len(entries) > max(self.LOAD, self._length // 8):
+            merged = [entry for block in self._blocks for entry in block]
+            merged.extend(entries)
+            # Sorting a sorted run followed by a sorted-ish one is close
+            # to linear.
+            merged.sort()
+            self._rebuild(merged)
+        else:
+            for key, position in entries:
+                self.add(key, position)
+
+    def _rebuild(self, entries: list):
+        """Replaces the entries with sorted `entries`."""
+        load = self.LOAD
+        self._blocks = [entries[start:start + load]
+                        for start in range(0, len(entries), load)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._length = len(entries)
+        self._build_tree()
+
+    def _split(self, index: int):
+        """Splits a full block in two."""
+        block = self._blocks[index]
+        half = block[self.LOAD:]
+        del block[self.LOAD:]
+        self._blocks.insert(index + 1, half)
+        self._maxes[index] = block[-1]
+        self._maxes.insert(index + 1, half[-1])
+        self._build_tree()
+
+    def _build_tree(self):
+        """Builds the Fenwick tree of block lengths in O(blocks)."""
+        tree = [0] + [len(block) for block in self._blocks]
+        for node in range(1, len(tree)):
+            parent = node + (node & -node)
+            if parent < len(tree):
+                tree[parent] += tree[node]
+        self._tree = tree
+
+    def _grow(self, index: int):
+        """Counts one more entry in a block."""
+        tree = self._tree
+        node = index + 1
+        while node < len(tree):
+            tree[node] += 1
+            node += node & -node
+
+    def _rank(self, index: int, offset: int) -> int:
+        """Returns the number of entries before a block offset."""
+        tree = self._tree
+        rank = offset
+        node = index
+        while node:
+            rank += tree[node]
+            node -= node & -node
+        return rank
+
+    def _find(self, entry: tuple, right: bool = False) -> tuple:
+        """
+        Finds where an entry would be inserted.
+
+        Returns:
+            tuple[int, int]: The block and the offset in it; the
+            number of blocks and 0 past the last entry.
+        """
+        search = bisect.bisect_right if right else bisect.bisect_left
+        index = search(self._maxes, entry)
+        if index == len(self._blocks):
+            return index, 0
+        return index, search(self._blocks[index], entry)
+
+    def _bounds(self, low: float = None, high: float = None) -> tuple:
+        """Returns where the entries with low <= key <= high lie."""
+        start = (0, 0) if low is None else self._find((low,))
+        end = (len(self._blocks), 0) if high is None \
+            else self._find((high, _INF), right=True)
+        return start, max(start, end)
+
+    def count(self, low: float = None, high: float = None) -> int:
+        """
+        Counts the orders with a key in a range.
+
+        Args:
+            low (float, optional): The lowest key, inclusive.
+            high (float, optional): The highest key, inclusive.
+        """
+        start, end = self._bounds(low, high)
+        return self._rank(*end) - self._rank(*start)
+
+    def positions(self, low: float = None, high: float = None) -> list:
+        """
+        Returns the positions of the orders with a key in a range,
+        ordered by key.
+
+        Args:
+            low (float, optional): The lowest key, inclusive.
+            high (float, optional): The highest key, inclusive.
+        """
+        (first, start), (last, end) = self._bounds(low, high)
+        blocks = self._blocks
+        if first == last:
+            return [position for _, position in blocks[first][start:end]] \
+                if first < len(blocks) else []
+        found = [position for _, position in blocks[first][start:]]
+        for block in blocks[first + 1:last]:
+            found.extend(position for _, position in block)
+        if last < len(blocks):
+            found.extend(position for _, position in blocks[last][:end])
+        return found
+
+
+class _TypeIndex:
+    """The indexes of the orders of one vehicle type."""
+
+    __slots__ = ("positions", "engine_sizes", "costs")
+
+    def __init__(self):
+        self.positions = []
+        self.engine_sizes = SortedColumn()
+        self.costs = SortedColumn()
+
+
+def matches(order: dict, vehicle_type: str = None, min_engine_size=None,
+            max_engine_size=None, min_cost=None, max_cost=None) -> bool:
+    """
+    Checks an order against the criteria of `OrderIndex.candidates`.
+
+    Returns:
+        bool: Whether the order meets every criterion given.
+    """
+    if vehicle_type is not None and order["Name"] != vehicle_type:
+        return False
+    if min_engine_size is not None or max_engine_size is not None:
+        engine_size = order.get("EngineSize")
+        if engine_size is None \
+                or (min_engine_size is not None
+                    and engine_size < min_engine_size) \
+                or (max_engine_size is not None
+                    and engine_size > max_engine_size):
+            return False
+    cost = order["TotalCost"]
+    if min_cost is not None and cost < min_cost:
+        return False
+    if max_cost is not None and cost > max_cost:
+        return False
+    return True
+
+
+class OrderIndex:
+    """
+    Indexes orders by vehicle type, engine size and total cost.
+
+    Orders are identified by their position in the order book, which
+    must be the order in which they are added to the index.
+    """
+
+    def __init__(self):
+        self._types = {}
+
+    def add(self, order: dict, position: int):
+        """
+        Adds an order to the indexes.
+
+        Args:
+            order (dict): The details of the order.
+            position (int): The position of the order in the order book.
+        """
+        index = self._types.get(order["Name"])
+        if index is None:
+            index = self._types[order["Name"]] = _TypeIndex()
+        index.positions.append(position)
+        engine_size = order.get("EngineSize")
+        if engine_size is not None:
+            index.engine_sizes.add(engine_size, position)
+        index.costs.add(order["TotalCost"], position)
+
+    def add_many(self, orders, start: int):
+        """
+        Adds many orders to the indexes at once, sorting each index
+        once rather than as the orders arrive.
+
+        Args:
+            orders (Iterable[dict]): The details of the orders.
+            start (int): The position of the first order.
+        """
+        added = {}
+        for position, order in enumerate(orders, start):
+            entries = added.get(order["Name"])
+            if entries is None:
+                entries = added[order["Name"]] = ([], [], [])
+            entries[0].append(position)
+            engine_size = order.get("EngineSize")
+            if engine_size is not None:
+                entries[1].append((engine_size, position))
+            entries[2].append((order["TotalCost"], position))
+        for name, (positions, engine_sizes, costs) in added.items():
+            index = self._types.get(name)
+            if index is None:
+                index = self._types[name] = _TypeIndex()
+            index.positions.extend(positions)
+            index.engine_sizes.extend(engine_sizes)
+            index.costs.extend(costs)
+
+    def candidates(self, vehicle_type: str = None, min_engine_size=None,
+                   max_engine_size=None, min_cost=None,
+                   max_cost=None) -> list:
+        """
+        Finds the positions of the orders that may meet the criteria.
+
+        For each vehicle type, the engine size or the cost index,
+        whichever narrows the search down further, is searched. When
+        both an engine size and a cost range are given, the orders
+        found still have to be checked against the other range, e.g.
+        with `matches`.
+
+        Args:
+            vehicle_type (str, optional):
+            Only orders of this vehicle, e.g. "Motorcycle".
+            min_engine_size (int, optional):
+            The smallest engine size, inclusive. Orders without an
+            engine are left out if an engine size bound is given.
+            max_engine_size (int, optional):
+            The largest engine size, inclusive.
+            min_cost (int, optional): The lowest total cost, inclusive.
+            max_cost (int, optional): The highest total cost, inclusive.
+
+        Returns:
+            list[int]: The positions of the orders, in ascending order.
+        """
+        if vehicle_type is None:
+            indexes = list(self._types.values())
+        else:
+            index = self._types.get(vehicle_type)
+            indexes = [index] if index is not None else []
+
+        by_engine = min_engine_size is not None \
+            or max_engine_size is not None
+        by_cost = min_cost is not None or max_cost is not None
+        found = []
+        for index in indexes:
+            if by_engine and (not by_cost or index.engine_sizes.count(
+                    min_engine_size, max_engine_size)
+                    <= index.costs.count(min_cost, max_cost)):
+                found.extend(index.engine_sizes.positions(min_engine_size,
+                                                          max_engine_size))
+            elif by_cost:
+                found.extend(index.costs.positions(min_cost, max_cost))
+            else:
+                found.extend(index.positions)
+        found.sort()
+        return found
@@ -0,0 +1,417 @@
+"""
+Append-only order journal with snapshots.
+
+Every order added to a journaled `OrderManager` is appended to a binary
+journal file. Writes are fsynced in groups, after `sync_every` orders
+or `sync_interval` seconds, whichever comes first, so durability does
+not cost one fsync per order; at most the orders of the last group can
+be lost in a crash.
+
+Once the journal has grown to a quarter of the last snapshot, it is
+set aside as a numbered segment, a new journal is started and the
+order book is written to a new snapshot by a background thread, so
+adding orders never waits for it. The segments covered by the new
+snapshot are then removed. Snapshots are binary order files (see
+`order_export`) and are loaded in bulk; recovery then only replays the
+journaled orders after the snapshot, about a quarter as many.
+
+File formats, all integers little-endian:
+
+    journal:  "VFJ1", version (u16), orders before the first record (u64)
+    record:   CRC-32 of the order (u32), the order (40 bytes)
+
+Orders are encoded as the fixed-width records of `order_export`, so
+only built-in vehicles can be journaled, as in snapshots. Segments are
+journal files named after the journal with the number of orders up to
+their end appended, e.g. "orders.journal.00000000000000040000". A
+record cut short or failing its CRC marks the end of a journal: it is
+the write that was in progress when the process died, and is truncated
+on recovery.
+"""
+
+from __future__ import annotations
+import atexit
+import logging
+import os
+import struct
+import threading
+import zlib
+from order_export import (RECORD, BinaryOrderFile, pack_records,
+                          unpack_records)
+
+JOURNAL_MAGIC = b"VFJ1"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<4sHQ")
+_RECORD = struct.Struct(f"<I{RECORD.size}s")
+
+# Records read at a time during recovery.
+_RECORDS_PER_READ = 16384
+
+
+def _read_records(file):
+    """
+    Reads records from the current position of a file, a chunk at a
+    time.
+
+    Stops at the end of the file or at the first incomplete or
+    corrupt record.
+
+    Yields:
+        tuple[bytes, int]: The orders of a chunk, as `order_export`
+        records, and the file offset after them.
+    """
+    end = file.tell()
+    while True:
+        chunk = file.read(_RECORD.size * _RECORDS_PER_READ)
+        complete = len(chunk) - len(chunk) % _RECORD.size
+        records = []
+        for crc, record in _RECORD.iter_unpack(chunk[:complete]):
+            if zlib.crc32(record) != crc:
+                break
+            records.append(record)
+        end += len(records) * _RECORD.size
+        if records:
+            yield b"".join(records), end
+        if not chunk or len(records) * _RECORD.size != len(chunk):
+            return
+
+
+def _read_header(file) -> int:
+    """
+    Reads and checks the header of a journal file.
+
+    Returns:
+        int: The number of orders before the first record.
+
+    Raises:
+        ValueError: If the file is not a journal.
+    """
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{file.name} is truncated")
+    magic, version, base = _HEADER.unpack(header)
+    if magic != JOURNAL_MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{file.name} is not a version {FORMAT_VERSION} "
+                         "order journal")
+    return base
+
+
+def _fsync_directory(path: str):
+    """Makes a rename within the directory of `path` durable."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)),
+                         os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _create_journal(path: str, base: int):
+    """
+    Atomically creates an empty journal file.
+
+    Args:
+        path (str): The file to write.
+        base (int): The number of orders before its first record.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION, base))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(path)
+
+
+class OrderJournal:
+    """
+    A durable record of the orders of one order book.
+
+    Call `open` first; it returns the orders recovered from an earlier
+    run and prepares the journal for appending.
+
+    Attributes:
+        path (str): The journal file.
+        snapshot_path (str): The snapshot file, `path` + ".snapshot".
+        sync_every (int): Orders per fsync at most.
+        sync_interval (float): Seconds an order may wait for its fsync.
+        min_snapshot (int): Journal records before the first snapshot.
+        lock (threading.RLock):
+        Held while the journal is written. Hold it to keep appends and
+        a snapshot of the order book in step.
+    """
+
+    def __init__(self, path: str, sync_every: int = 1024,
+                 sync_interval: float = 0.05, min_snapshot: int = 10_000):
+        """
+        Args:
+            path (str): The journal file.
+            sync_every (int, optional):
+            Fsync after this many orders. Default is 1024.
+            sync_interval (float, optional):
+            Fsync at least this often while orders are pending, in
+            seconds. Default is 0.05.
+            min_snapshot (int, optional):
+            Journal records before the first snapshot. Default is 10000.
+        """
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.min_snapshot = min_snapshot
+        self.lock = threading.RLock()
+        self._file = None
+        self._base = 0
+        self._records = 0
+        self._unsynced = 0
+        self._closed = threading.Event()
+        self._syncer = None
+        self._snapshotter = None
+
+    def _segment_path(self, end: int) -> str:
+        """Returns the name of a segment holding the orders up to `end`."""
+        return f"{self.path}.{end:020d}"
+
+    def _segments(self) -> list:
+        """Returns the segments on disk, oldest first."""
+        directory, name = os.path.split(os.path.abspath(self.path))
+        prefix = f"{name}."
+        return sorted(os.path.join(directory, file_name)
+                      for file_name in os.listdir(directory)
+                      if file_name.startswith(prefix)
+                      and file_name[len(prefix):].isdigit())
+
+    @staticmethod
+    def _replay(path: str, count: int, orders: list) -> tuple:
+        """
+        Reads a journal file, collecting the orders past `count`.
+
+        Args:
+            path (str): The journal file.
+            count (int): The number of orders recovered so far.
+            orders (list[dict]): Receives the orders past `count`.
+
+        Returns:
+            tuple[int, int, int]: The number of orders before the
+            file's first record, its number of records and the offset
+            after its last complete record.
+
+        Raises:
+            ValueError: If the file does not follow on from the orders
+            recovered so far.
+        """
+        with open(path, "rb", buffering=1 << 20) as file:
+            base = _read_header(file)
+            if base > count:
+                raise ValueError(f"{path} starts after order {base}, but "
+                                 f"only {count} orders precede it")
+            end = file.tell()
+            records = 0
+            for chunk, end in _read_records(file):
+                skip = min(max(count - base - records, 0),
+                           len(chunk) // RECORD.size)
+                orders.extend(unpack_records(chunk[skip * RECORD.size:]))
+                records += len(chunk) // RECORD.size
+        return base, records, end
+
+    def open(self) -> tuple:
+        """
+        Recovers the orders of an earlier run and opens the journal
+        for appending, creating it if missing.
+
+        Returns:
+            tuple[str | None, list[dict]]: The snapshot file to load
+            the first orders from, None if there is none, and the
+            orders recovered from the journal after it, in the order
+            added.
+
+        Raises:
+            ValueError: If the files are corrupt or do not belong
+            together.
+        """
+        snapshot, count = None, 0
+        if os.path.exists(self.snapshot_path):
+            with BinaryOrderFile(self.snapshot_path) as snapshot_file:
+                count = len(snapshot_file)
+            snapshot = self.snapshot_path
+
+        orders = []
+        for segment in self._segments():
+            base, records, _ = self._replay(segment, count, orders)
+            count = max(count, base + records)
+        if not os.path.exists(self.path):
+            _create_journal(self.path, count)
+        self._base, self._records, end = self._replay(self.path, count,
+                                                      orders)
+
+        self._file = open(self.path, "r+b")
+        if self._file.seek(0, os.SEEK_END) != end:
+            logging.warning("Discarding incomplete record at the end of %s",
+                            self.path)
+            self._file.truncate(end)
+            self._file.seek(end)
+            self._sync_locked()
+
+        self._closed.clear()
+        self._syncer = threading.Thread(target=self._sync_periodically,
+                                        name="order-journal", daemon=True)
+        self._syncer.start()
+        atexit.register(self.close)
+        return snapshot, orders
+
+    @staticmethod
+    def encode(order) -> bytes:
+        """
+        Encodes an order as a journal record, e.g. to check that it
+        can be journaled before adding it anywhere.
+
+        Args:
+            order (dict): The details of the order.
+
+        Returns:
+            bytes: The record.
+
+        Raises:
+            ValueError: If the order is not of a built-in vehicle or
+            does not fit a record.
+        """
+        try:
+            record = pack_records((order,))
+        except struct.error as error:
+            raise ValueError(
+                f"Order does not fit the journal: {error}") from None
+        return _RECORD.pack(zlib.crc32(record), record)
+
+    def append(self, order):
+        """
+        Appends an order to the journal.
+
+        Args:
+            order (dict | bytes):
+            The details of the order, or its record from `encode`.
+
+        Raises:
+            ValueError: If the journal is not open, or the order cannot
+            be journaled.
+        """
+        record = order if isinstance(order, bytes) else self.encode(order)
+        with self.lock:
+            if self._file is None:
+                raise ValueError("Order journal is not open")
+            self._file.write(record)
+            self._records += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        """Flushes and fsyncs the journal. Call with the lock held."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self):
+        """Makes every order appended so far durable."""
+        with self.lock:
+            if self._file is not None and self._unsynced:
+                self._sync_locked()
+
+    def _sync_periodically(self):
+        """Fsyncs pending orders every `sync_interval` seconds."""
+        while not self._closed.wait(self.sync_interval):
+            try:
+                self.sync()
+            except OSError as error:
+                logging.error('Error occurred while syncing %s: %s',
+                              self.path, str(error))
+
+    def needs_snapshot(self) -> bool:
+        """
+        Returns whether the journal has grown to a quarter of the last
+        snapshot and no snapshot is being written, so that
+        `start_snapshot` should be called.
+        """
+        return self._records >= max(self.min_snapshot, self._base // 4) \
+            and (self._snapshotter is None
+                 or not self._snapshotter.is_alive())
+
+    def start_snapshot(self, write) -> int:
+        """
+        Sets the journal aside as a segment, starts a new one and
+        writes a snapshot of the orders so far in the background.
+
+        Hold `lock` while appending if other threads may append
+        meanwhile, so that the orders so far are the orders appended.
+
+        Args:
+            write (Callable[[str, int], int]):
+            Called from the background thread with the snapshot path
+            and the number of orders appended so far, as `count`. It
+            must atomically write the first `count` orders of the
+            order book, in the order appended, to a binary order file
+            with `sync` set (see `order_export.write_binary`), and
+            return the number of orders written.
+
+        Returns:
+            int: The number of orders the snapshot will hold.
+        """
+        with self.lock:
+            self._sync_locked()
+            count = self._base + self._records
+            self._file.close()
+            os.replace(self.path, self._segment_path(count))
+            _create_journal(self.path, count)
+            self._file = open(self.path, "r+b")
+            self._file.seek(0, os.SEEK_END)
+            self._base = count
+            self._records = 0
+            self._snapshotter = threading.Thread(
+                target=self._write_snapshot, args=(write, count),
+                name="order-snapshot")
+            self._snapshotter.start()
+            return count
+
+    def _write_snapshot(self, write, count: int):
+        """
+        Writes the first `count` orders to the snapshot and removes
+        the segments it covers. Runs in the background.
+        """
+        try:
+            written = write(self.snapshot_path, count)
+            _fsync_directory(self.snapshot_path)
+            if written != count:
+                raise ValueError(f"Expected {count} orders but got "
+                                 f"{written}")
+            for segment in self._segments():
+                if int(segment.rpartition(".")[2]) <= count:
+                    os.remove(segment)
+        except (OSError, ValueError) as error:
+            # The segments are kept, so no order is lost.
+            logging.error('Error occurred while writing a snapshot of %s: '
+                          '%s', self.path, str(error))
+            return
+        logging.info('Wrote a snapshot of %d orders to %s', count,
+                     self.snapshot_path)
+
+    def wait_for_snapshot(self):
+        """Waits until a snapshot being written, if any, is done."""
+        snapshotter = self._snapshotter
+        if snapshotter is not None:
+            snapshotter.join()
+
+    def close(self):
+        """Waits for any snapshot, then syncs and closes the journal."""
+        self.wait_for_snapshot()
+        self._closed.set()
+        if self._syncer is not None:
+            self._syncer.join()
+            self._syncer = None
+        with self.lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+        atexit.unregister(self.close)
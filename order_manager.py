@@ -1,49 +1,301 @@
+import itertools
+from invoice_writer import InvoiceWriter
+from money import format_sek
+from order_index import OrderIndex, matches
+from order_export import (BinaryOrderFile, load_numpy, write_binary,
+                          write_columns, write_csv, write_jsonl)
+from order_journal import OrderJournal
+from order_statistics import OrderStatistics
+from order_store import ColumnarOrderStore
+from pricelist import volume_discount
+
+
 class OrderManager:
     """
     Manages and processes vehicle orders including calculating costs
     and generating invoices.
 
     Attributes:
-        _orders (list[dict]): A list storing the details of each 
-        vehicle order.
-        total_cost (float): A current total cost of all orders added.
+        _orders (list[dict] | ColumnarOrderStore): A list storing the
+        details of each vehicle order, or a columnar store of them.
+        total_cost (int): 
+        A current total cost of all orders added, in öre.
+        verbose (bool): Whether added orders are printed.
+        _statistics (OrderStatistics):
+        Running per vehicle type aggregates of the orders added.
+        _index (OrderIndex): Indexes of the orders, or None.
+        _journal (OrderJournal): The journal of the orders, or None.
     """
     
-    def __init__(self):
+    def __init__(self, verbose: bool = True, compact: bool = False,
+                 indexed: bool = False, journal: str = None):
         """
         Initializes a new instance of OrderManager with an empty 
         orderlist and zero total cost.
+
+        Args:
+            verbose (bool, optional): 
+            Print the details of each order as it is added. Bulk 
+            callers should pass False. Default is True.
+            compact (bool, optional): 
+            Keep orders in a `ColumnarOrderStore` rather than a list
+            of dictionaries, trading dictionary access for a much
+            smaller memory footprint. Default is False.
+            indexed (bool, optional): 
+            Keep indexes by vehicle type, engine size and total cost,
+            so that `find_orders` need not scan every order. 
+            Default is False.
+            journal (str, optional): 
+            Record every order in this journal file (see 
+            `OrderJournal`), first recovering the orders already 
+            recorded there. Call `close` when done. Default is None.
         """
-        self._orders = []
+        self._orders = ColumnarOrderStore() if compact else []
         self.total_cost = 0
+        self.verbose = verbose
+        self._statistics = OrderStatistics()
+        self._index = OrderIndex() if indexed else None
+        self._invoice_writers = {}
+        self._journal = None
+        if journal is not None:
+            order_journal = OrderJournal(journal)
+            self._restore(*order_journal.open())
+            self._journal = order_journal
+
+    def _load_snapshot(self, path: str, statistics: OrderStatistics) -> tuple:
+        """
+        Appends the orders of a snapshot to the order list in bulk.
+
+        Args:
+            path (str): The snapshot, a binary order file.
+            statistics (OrderStatistics): Receives the orders' figures.
+
+        Returns:
+            tuple[int, int]: The number of orders and their total cost.
+        """
+        records, names = load_numpy(path)
+        if isinstance(self._orders, ColumnarOrderStore):
+            self._orders.extend_records(records)
+        else:
+            with BinaryOrderFile(path) as orders:
+                self._orders.extend(orders)
+        statistics.add_records(records, names)
+        if self._index is not None:
+            start = len(self._orders) - len(records)
+            self._index.add_many(
+                (self._orders[position]
+                 for position in range(start, len(self._orders))), start)
+        return len(records), int(records["total"].sum())
+
+    def _write_snapshot(self, path: str, count: int) -> int:
+        """
+        Writes the first orders to a snapshot for the journal.
+
+        Called from the journal's background thread while orders may
+        still be added.
+
+        Args:
+            path (str): The snapshot, a binary order file.
+            count (int): The number of orders to write.
+
+        Returns:
+            int: The number of orders written.
+        """
+        if isinstance(self._orders, ColumnarOrderStore):
+            return write_columns(self._orders.columns(count), path,
+                                 sync=True)
+        return write_binary(itertools.islice(self.iter_orders(), count),
+                            path, sync=True)
+
+    def _restore(self, snapshot: str, orders):
+        """
+        Adds recovered orders without journaling or printing them.
+
+        Args:
+            snapshot (str): The snapshot to load first, or None.
+            orders (Iterable[dict]): The orders to add after it.
+        """
+        verbose, self.verbose = self.verbose, False
+        try:
+            if snapshot is not None:
+                _, total_cost = self._load_snapshot(snapshot,
+                                                    self._statistics)
+                self.total_cost += total_cost
+            self.add_orders(orders)
+        finally:
+            self.verbose = verbose
     
     def add_order(self, order:dict):
         """
-        Adds a new order to the order list, updates the total cost,
-        and prints the order details.
+        Adds a new order to the order list, updates the total cost
+        and statistics, records it in the journal, if any, and prints
+        the order details when verbose.
 
         Args:
             order (dict): 
             A dictionary containing the details of the order, 
             expected to contain keys like "TotalCost" and "Name".
+
+        Raises:
+            ValueError: If the order cannot be stored or journaled, in
+            which case it is not added.
         """
+        # Encoded first, so an order that cannot be journaled is not
+        # added either.
+        record = None if self._journal is None \
+            else self._journal.encode(order)
         self._orders.append(order)
+        if self._index is not None:
+            self._index.add(order, len(self._orders) - 1)
         self.total_cost += order["TotalCost"]
-        self._print_order_details(order)
+        self._statistics.add(order)
+        if record is not None:
+            self._journal.append(record)
+            if self._journal.needs_snapshot():
+                self._journal.start_snapshot(self._write_snapshot)
+        if self.verbose:
+            self._print_order_details(order)
+
+    def add_orders(self, orders):
+        """
+        Adds many orders at once, with the same effect as calling
+        `add_order` for each in turn, in one pass.
+
+        Args:
+            orders (Iterable[dict]): The orders to add, in order.
+        """
+        store, index = self._orders, self._index
+        statistics, journal = self._statistics, self._journal
+        total_cost = 0
+        try:
+            for order in orders:
+                record = None if journal is None else journal.encode(order)
+                store.append(order)
+                if index is not None:
+                    index.add(order, len(store) - 1)
+                total_cost += order["TotalCost"]
+                statistics.add(order)
+                if record is not None:
+                    journal.append(record)
+                if self.verbose:
+                    self._print_order_details(order)
+        finally:
+            self.total_cost += total_cost
+        if journal is not None and journal.needs_snapshot():
+            journal.start_snapshot(self._write_snapshot)
+
+    def close(self):
+        """
+        Makes the journaled orders durable and closes the journal,
+        once any snapshot being written is done.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
         
     def print_total_cost(self):
         """Prints the total cost of all orders in a formatted string."""
-        print(f"\nTotal cost of all orders: {self.total_cost} SEK")
+        print(f"\nTotal cost of all orders: {format_sek(self.total_cost)}")
 
-    def get_total_cost(self) -> float:
-        """Returns the total cost of all orders."""
+    def get_total_cost(self) -> int:
+        """Returns the total cost of all orders, in öre."""
         return self.total_cost
     
     def get_total_orders(self) -> int:
         """Returns the total number of orders."""
         return len(self._orders)
+
+    def get_volume_discount(self) -> int:
+        """
+        Returns the volume discount on all orders, for the number of
+        vehicles ordered, by the current pricing rules.
+
+        Returns:
+            int: The discount, in öre. 0 if no discount applies.
+        """
+        return volume_discount(self.get_total_cost(),
+                               self.get_total_orders())
+
+    def get_statistics(self) -> OrderStatistics:
+        """
+        Returns the running statistics of the orders added: counts,
+        revenue and part costs per vehicle type, engine size
+        histograms and order value quantiles. They are kept up to date
+        as orders are added, so reading them does not scan the orders.
+
+        Returns:
+            OrderStatistics: The statistics. Treat as read-only.
+        """
+        return self._statistics
     
-    def format_order(self, order: dict, index: int = None) -> str:
+    def iter_orders(self, start: int = 0):
+        """
+        Iterates over the orders in the order they were added.
+
+        Args:
+            start (int, optional): 
+            Index of the first order to yield. Default is 0.
+
+        Yields:
+            dict: The details of each order.
+        """
+        orders = self._orders
+        for index in range(start, len(orders)):
+            yield orders[index]
+    
+    def find_orders(self, vehicle_type: str = None, min_engine_size=None,
+                    max_engine_size=None, min_cost=None,
+                    max_cost=None) -> list:
+        """
+        Finds the orders meeting all of the given criteria, e.g. all
+        motorcycles of 600-1000cc costing over 50000 SEK:
+
+        >>> order_manager.find_orders("Motorcycle", 600, 1000, 5_000_000)
+
+        With indexes (see `indexed`), the k orders of a range of
+        engine sizes or costs are found in O(log n + k) time and put
+        back in the order they were added in O(k log k); when both
+        ranges are given, the candidates of the narrower one are
+        checked against the other. Without indexes every order is
+        checked.
+
+        Args:
+            vehicle_type (str, optional): 
+            Only orders of this vehicle, as named in the orders, 
+            e.g. "Motorcycle".
+            min_engine_size (int, optional): 
+            The smallest engine size, inclusive. Orders without an 
+            engine are left out if an engine size bound is given.
+            max_engine_size (int, optional): 
+            The largest engine size, inclusive.
+            min_cost (int, optional): 
+            The lowest total cost in öre, inclusive.
+            max_cost (int, optional): 
+            The highest total cost in öre, inclusive.
+
+        Returns:
+            list[dict]: The orders found, in the order they were added.
+        """
+        criteria = {
+            "vehicle_type": vehicle_type,
+            "min_engine_size": min_engine_size,
+            "max_engine_size": max_engine_size,
+            "min_cost": min_cost,
+            "max_cost": max_cost,
+        }
+        if self._index is None:
+            return [order for order in self.iter_orders()
+                    if matches(order, **criteria)]
+        orders = self._orders
+        found = []
+        for position in self._index.candidates(**criteria):
+            order = orders[position]
+            if matches(order, **criteria):
+                found.append(order)
+        return found
+
+    @staticmethod
+    def format_order(order: dict, index: int = None) -> str:
         """
         Formats the order details into a readable string.
 
@@ -67,11 +319,12 @@ class OrderManager:
 
         if order.get("Parts"):
             for part, cost in order["Parts"].items():
-                order_str_list.append(f"    {part}: {cost} SEK\n")
+                order_str_list.append(f"    {part}: {format_sek(cost)}\n")
         else:
             order_str_list.append("    No parts details available.\n")
 
-        order_str_list.append(f"    Total: {order['TotalCost']} SEK\n")
+        order_str_list.append(
+            f"    Total: {format_sek(order['TotalCost'])}\n")
 
         return ''.join(order_str_list)
 
@@ -85,15 +338,74 @@ class OrderManager:
         """
         print(self.format_order(order))
     
-    def generate_invoice(self):
+    def export_binary(self, path: str) -> int:
+        """
+        Exports all orders to a fixed-width binary file that can be
+        memory-mapped, see `order_export`.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of orders exported.
+
+        Raises:
+            ValueError: If an order's vehicle type has no type code.
+        """
+        return write_binary(self.iter_orders(), path)
+
+    def export_jsonl(self, path: str) -> int:
+        """
+        Exports all orders to a JSONL file, one order per line with its
+        cost per part, see `order_export`.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of orders exported.
+        """
+        return write_jsonl(self.iter_orders(), path)
+
+    def export_csv(self, path: str) -> int:
+        """
+        Exports all orders to a CSV file, one order per row with its
+        cost per part, see `order_export`.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of orders exported.
+
+        Raises:
+            ValueError: If an order has a part without a CSV column.
+        """
+        return write_csv(self.iter_orders(), path)
+
+    def generate_invoice(self, path: str = "invoice.txt",
+                         progress=None, cancel=None) -> int:
         """
         Generates an invoice detailing all orders saving it in .txt
         format.
+
+        Orders already written to the same path by an earlier call are
+        kept, and only the orders added since are appended.
+
+        Args:
+            path (str, optional): 
+            The file to write the invoice to. Default is "invoice.txt".
+            progress (Callable[[int, int], None], optional): 
+            Called as orders are written with the number of orders 
+            in the invoice so far and the number to invoice.
+            cancel (threading.Event, optional): 
+            Stops writing once set. The invoice is completed by the 
+            next call.
+
+        Returns:
+            int: The number of orders newly written to the invoice.
         """
-        with open("invoice.txt", "w") as file:
-            file.write("           INVOICE\n")
-            file.write("================================\n")
-            for i, order in enumerate(self._orders, 1):
-                file.write(self.format_order(order, i))
-            file.write("\n")
-            file.write(f"Total Cost: {self.get_total_cost()} SEK\n")
\ No newline at end of file
+        writer = self._invoice_writers.get(path)
+        if writer is None:
+            writer = self._invoice_writers[path] = InvoiceWriter(path)
+        return writer.write(self, progress, cancel)
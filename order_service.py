@@ -0,0 +1,484 @@
+"""Vehicle Factory order service.
+
+Runs the factory as a local asyncio service so that other tools can
+share one warm process. Clients connect over a Unix socket or a
+localhost TCP port and exchange newline-delimited JSON messages:
+
+    {"id": 1, "op": "quote", "vehicle": "Car", "engine_size": 1600}
+    {"id": 2, "op": "place_order", "vehicle": "Bicycle"}
+    {"id": 3, "op": "invoice", "path": "invoice.txt"}
+    {"id": 4, "op": "total"}
+
+When started with a session directory, requests may name a "session"
+(e.g. a customer ID) to place orders in, invoice and total that
+session's own order book; see `SessionManager`.
+
+Invoices are written to the service's invoice directory; "path" may
+only name a file in it. A session's invoice is written to its
+"sessions" subdirectory instead, named after the session (see
+`batch_invoicing.invoice_path`), so it cannot collide with a named
+invoice or with the files spilled by the session manager.
+
+Each request is answered with one line holding the same "id" and
+either "ok": true and the result, or "ok": false and an "error".
+Costs in results are integer öre; a "total" holds the undiscounted
+"total_cost" and the volume "discount" on it.
+
+Requests arriving within a short window are coalesced: the vehicles
+of a batch are priced with one `quoting.quote_batch` call and its
+orders added to each `OrderManager` with one `add_orders` call, in
+arrival order. Invoices and totals in a batch see the orders placed
+before them.
+
+Usage:
+    python order_service.py --unix /tmp/vehicle_factory.sock
+    python order_service.py --port 8765 --sessions sessions
+    python order_service.py --port 8765 --invoice-dir invoices
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+from batch_invoicing import invoice_path
+from batching import checked_file_name
+from bulk_order import parse_row
+from order_manager import OrderManager
+from quoting import quote_batch
+from session_manager import SessionManager
+from vehicle_factory import VehicleFactory, VehicleType
+
+
+class OrderService:
+    """
+    Serves quote, order and invoice requests over asyncio streams.
+
+    Attributes:
+        factory (VehicleFactory): Creates and assembles the vehicles.
+        order_manager (OrderManager):
+        Receives the placed orders of requests without a session.
+        sessions (SessionManager):
+        The order books of requests naming a session, or None.
+        session_idle (float):
+        Seconds after which an unused session is spilled to disk.
+        invoice_dir (str): The directory invoices are written to.
+        session_invoice_dir (str):
+        The subdirectory of `invoice_dir` session invoices are
+        written to.
+        batch_window (float):
+        Seconds to wait for more requests before processing a batch.
+        max_batch (int): The maximum number of requests per batch.
+    """
+
+    def __init__(self, factory: VehicleFactory = None,
+                 order_manager: OrderManager = None,
+                 batch_window: float = 0.002, max_batch: int = 1024,
+                 sessions: SessionManager = None,
+                 session_idle: float = 600.0,
+                 invoice_dir: str = "invoices"):
+        """
+        Args:
+            factory (VehicleFactory, optional):
+            The factory to use. A new one with a quote cache if None.
+            order_manager (OrderManager, optional):
+            The order manager to use. A new, quiet one if None.
+            batch_window (float, optional):
+            Seconds to wait for more requests. Default is 2ms.
+            max_batch (int, optional):
+            The maximum number of requests per batch. Default is 1024.
+            sessions (SessionManager, optional):
+            Serve requests naming a "session" from their own order
+            book. Such requests are rejected if None.
+            session_idle (float, optional):
+            Seconds after which an unused session is spilled to disk.
+            Default is 600.
+            invoice_dir (str, optional):
+            The directory to write invoices to, created if missing.
+            Default is "invoices".
+        """
+        self.factory = factory or VehicleFactory(quote_cache_size=4096)
+        self.order_manager = order_manager or OrderManager(verbose=False)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.sessions = sessions
+        self.session_idle = session_idle
+        self.invoice_dir = invoice_dir
+        self.session_invoice_dir = os.path.join(invoice_dir, "sessions")
+        os.makedirs(invoice_dir, exist_ok=True)
+        if sessions is not None:
+            os.makedirs(self.session_invoice_dir, exist_ok=True)
+        self._queue = None
+        self._batcher = None
+
+    async def start(self, path: str = None, host: str = "127.0.0.1",
+                    port: int = 8765) -> asyncio.AbstractServer:
+        """
+        Starts accepting connections.
+
+        Args:
+            path (str, optional):
+            Listen on this Unix socket instead of a TCP port.
+            host (str, optional):
+            The address to listen on. Default is "127.0.0.1".
+            port (int, optional): The port to listen on. Default is 8765.
+
+        Returns:
+            asyncio.AbstractServer: The running server.
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._process_batches())
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle_client,
+                                                   path=path)
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    async def stop(self):
+        """Stops processing requests."""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        """
+        Answers the requests of one connection until it is closed.
+
+        Requests on the same connection are handled concurrently, so a
+        response may overtake the response to an earlier request.
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line: bytes):
+            response = await self._respond(line)
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes) -> dict:
+        """
+        Handles one request line.
+
+        Args:
+            line (bytes): The JSON encoded request.
+
+        Returns:
+            dict: The response to send back.
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            request_id = request.get("id")
+            result = await self.submit(request)
+        except (ValueError, OSError) as error:
+            return {"id": request_id, "ok": False, "error": str(error)}
+        except Exception as error:
+            logging.error('Error occurred while serving request: %s',
+                          str(error))
+            return {"id": request_id, "ok": False,
+                    "error": "Internal error"}
+        return {"id": request_id, "ok": True, **result}
+
+    async def submit(self, request: dict) -> dict:
+        """
+        Queues a request for the next batch and waits for its result.
+
+        Args:
+            request (dict): The request, with an "op" field.
+
+        Returns:
+            dict: The result of the request.
+
+        Raises:
+            ValueError: If the request is invalid.
+        """
+        op = request.get("op")
+        session = request.get("session")
+        if session is not None:
+            if self.sessions is None:
+                raise ValueError("Sessions are not enabled")
+            self.sessions.spill_path(session)
+
+        if op in ("quote", "place_order"):
+            payload = parse_row(request)
+        elif op == "invoice" and session is not None:
+            if request.get("path"):
+                raise ValueError("Session invoices are named after the "
+                                 "session; omit \"path\"")
+            payload = invoice_path(self.session_invoice_dir, session)
+        elif op == "invoice":
+            name = checked_file_name(request.get("path") or "invoice.txt",
+                                     "Invoice path")
+            payload = os.path.join(self.invoice_dir, name)
+        elif op == "total":
+            payload = None
+        else:
+            raise ValueError(f"Unknown operation: {op}")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, payload, session, future))
+        return await future
+
+    async def _next_batch(self) -> list:
+        """
+        Waits for a request, then collects those arriving within the
+        batch window.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _assemble(self, specs: list) -> list:
+        """
+        Assembles the vehicles of a batch.
+
+        Built-in vehicles are priced together in one vectorized
+        `quote_batch` pass; vehicles added by plugins are assembled by
+        the factory one by one.
+
+        Args:
+            specs (list[tuple[VehicleType | str, int | None]]):
+            Vehicle types and engine sizes, as returned by `parse_row`.
+
+        Returns:
+            list[dict | Exception]: The order of each specification, or
+            the error assembling it.
+        """
+        orders = [None] * len(specs)
+        quoted = [position for position, (vehicle_type, _)
+                  in enumerate(specs)
+                  if isinstance(vehicle_type, VehicleType)
+                  and VehicleFactory.is_builtin(vehicle_type)]
+        if quoted:
+            quote = quote_batch([specs[position][0] for position in quoted],
+                                [specs[position][1] or 0
+                                 for position in quoted])
+            columns = zip(quote["Chassis"].tolist(), quote["Tires"].tolist(),
+                          quote["Engine"].tolist(),
+                          quote["TotalCost"].tolist())
+            for position, (chassis, tires, engine, total) in zip(quoted,
+                                                                 columns):
+                vehicle_type, engine_size = specs[position]
+                order = {"Name": vehicle_type.name.capitalize(),
+                         "Parts": {"Chassis": chassis, "Tires": tires},
+                         "TotalCost": total}
+                if engine_size is not None:
+                    order["Parts"]["Engine"] = engine
+                    order["EngineSize"] = engine_size
+                orders[position] = order
+
+        for position, spec in enumerate(specs):
+            if orders[position] is None:
+                try:
+                    orders[position] = self.factory.assemble(*spec)
+                except Exception as error:
+                    orders[position] = error
+        return orders
+
+    def _add_orders(self, placed: dict):
+        """
+        Adds the orders placed in a batch, one call per order book,
+        and answers their requests.
+
+        Args:
+            placed (dict[str | None, list[tuple[dict, Future]]]):
+            The orders of each session, None for requests without one,
+            with the futures of their requests.
+        """
+        for session, requests in placed.items():
+            orders = [order for order, _ in requests]
+            try:
+                if session is None:
+                    self.order_manager.add_orders(orders)
+                else:
+                    with self.sessions.session(session) as order_manager:
+                        order_manager.add_orders(orders)
+            except Exception as error:
+                for _, future in requests:
+                    _set_exception(future, error)
+                continue
+            for order, future in requests:
+                # The response gets its own copy of the order.
+                _set_result(future,
+                            {"order": {**order,
+                                       "Parts": dict(order["Parts"])}})
+        placed.clear()
+
+    async def _process_batches(self):
+        """
+        Processes queued requests batch by batch, in arrival order.
+
+        Orders are only ever added here, so an invoice never runs
+        while orders are being added. If a batch fails as a whole, its
+        unanswered requests get the error and the next batch is
+        processed as usual.
+        """
+        while True:
+            batch = [request for request in await self._next_batch()
+                     if not request[3].cancelled()]
+            try:
+                await self._process_batch(batch)
+            except Exception as error:
+                logging.exception('Error occurred while processing a '
+                                  'batch of %d requests', len(batch))
+                for *_, future in batch:
+                    _set_exception(future, error)
+
+    async def _process_batch(self, batch: list):
+        """
+        Processes one batch of requests.
+
+        Args:
+            batch (list[tuple[str, object, str | None, Future]]):
+            The operation, payload, session and future of each request.
+        """
+        loop = asyncio.get_running_loop()
+        assembled = iter(self._assemble(
+            [payload for op, payload, _, _ in batch
+             if op in ("quote", "place_order")]))
+        placed = {}
+        for op, payload, session, future in batch:
+            if op in ("quote", "place_order"):
+                order = next(assembled)
+                if isinstance(order, Exception):
+                    _set_exception(future, order)
+                    continue
+                if op == "place_order":
+                    placed.setdefault(session, []).append((order, future))
+                else:
+                    _set_result(future, {"order": order})
+                continue
+            try:
+                self._add_orders(placed)
+                order_manager = self.order_manager if session is None \
+                    else self.sessions.get(session)
+                if op == "invoice":
+                    written = await loop.run_in_executor(
+                        None, order_manager.generate_invoice, payload)
+                    result = {"path": payload, "orders_written": written}
+                else:
+                    result = {
+                        "orders": order_manager.get_total_orders(),
+                        "total_cost": order_manager.get_total_cost(),
+                        "discount": order_manager.get_volume_discount()
+                    }
+            except Exception as error:
+                _set_exception(future, error)
+            else:
+                _set_result(future, result)
+        self._add_orders(placed)
+        if self.sessions is not None:
+            self.sessions.evict_idle(self.session_idle)
+
+
+def _set_result(future: asyncio.Future, result):
+    """Answers a request, unless its client has given up on it."""
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, error: Exception):
+    """Fails a request, unless its client has given up on it."""
+    if not future.done():
+        future.set_exception(error)
+
+
+async def serve(path: str = None, host: str = "127.0.0.1",
+                port: int = 8765, session_dir: str = None,
+                invoice_dir: str = "invoices"):
+    """
+    Runs an OrderService until cancelled.
+
+    Args:
+        path (str, optional): Unix socket to listen on.
+        host (str, optional): The address to listen on.
+        port (int, optional): The port to listen on.
+        session_dir (str, optional):
+        Enable sessions, spilling them to this directory.
+        invoice_dir (str, optional):
+        Write invoices to this directory. Default is "invoices".
+    """
+    sessions = SessionManager(session_dir) if session_dir else None
+    service = OrderService(sessions=sessions, invoice_dir=invoice_dir)
+    server = await service.start(path, host, port)
+    logging.info("Order service listening on %s",
+                 path or f"{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        if sessions is not None:
+            sessions.flush()
+
+
+def main(argv=None):
+    """
+    Entry point for the order service.
+
+    Args:
+        argv (list[str], optional):
+        Command line arguments. Uses sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve Vehicle Factory quotes and orders.")
+    parser.add_argument("--unix", metavar="PATH",
+                        help="Listen on a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on. Default: 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port to listen on. Default: 8765")
+    parser.add_argument("--sessions", metavar="DIR",
+                        help="Serve per-session order books, spilling "
+                             "idle ones to this directory.")
+    parser.add_argument("--invoice-dir", default="invoices", metavar="DIR",
+                        help="Directory to write invoices to. "
+                             "Default: invoices")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.unix, args.host, args.port, args.sessions,
+                          args.invoice_dir))
+    except KeyboardInterrupt:
+        pass
+
+
+# Run the service
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Running order statistics.
+
+`OrderStatistics` is updated as each order is added and keeps, per
+vehicle type, the order count, revenue and cost of each part, a
+histogram of engine sizes and a `QuantileSketch` of order values. None
+of the figures require a pass over the orders, so they can be polled
+as often as needed however large the order book grows.
+
+Statistics kept separately, e.g. per thread, can be combined with
+`merge`.
+"""
+
+from __future__ import annotations
+import math
+
+# Width, in cc, of the engine size histogram bins.
+ENGINE_BIN_CC = 250
+
+
+class QuantileSketch:
+    """
+    Estimates quantiles of a stream of values in bounded memory.
+
+    Positive values are counted in logarithmically sized buckets, so
+    any quantile is estimated within `relative_accuracy` of its true
+    value. The number of buckets grows with the logarithm of the range
+    of values, not with the number of values, and sketches with the
+    same accuracy can be merged exactly.
+
+    Attributes:
+        relative_accuracy (float): The relative error of estimates.
+        count (int): The number of values added.
+    """
+
+    __slots__ = ("relative_accuracy", "count", "_gamma_log", "_buckets",
+                 "_zero_count")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Args:
+            relative_accuracy (float, optional):
+            The relative error of estimates, between 0 and 1.
+            Default is 0.01 (1%).
+
+        Raises:
+            ValueError: If the accuracy is not between 0 and 1.
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Relative accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self._gamma_log = math.log((1 + relative_accuracy)
+                                   / (1 - relative_accuracy))
+        self._buckets = {}
+        self._zero_count = 0
+
+    def add(self, value: float, count: int = 1):
+        """
+        Adds a value to the sketch. Values of zero or less are counted
+        as zero.
+
+        Args:
+            value (float): The value to add.
+            count (int, optional):
+            The number of times to add it. Default is 1.
+        """
+        self.count += count
+        if value <= 0:
+            self._zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._gamma_log)
+        buckets = self._buckets
+        buckets[key] = buckets.get(key, 0) + count
+
+    def merge(self, other: QuantileSketch):
+        """
+        Adds the values counted by another sketch to this one.
+
+        Args:
+            other (QuantileSketch): A sketch with the same accuracy.
+
+        Raises:
+            ValueError: If the sketches have different accuracies.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different accuracy")
+        self.count += other.count
+        self._zero_count += other._zero_count
+        buckets = self._buckets
+        for key, count in list(other._buckets.items()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile of the values added.
+
+        Args:
+            q (float): The quantile, from 0 to 1, e.g. 0.5 for the median.
+
+        Returns:
+            float: The estimate, or None if no values were added.
+
+        Raises:
+            ValueError: If q is not between 0 and 1.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                break
+        # The midpoint of the bucket, in the sense that minimises the
+        # relative error to any value in it.
+        gamma = math.exp(self._gamma_log)
+        return 2 * math.exp(key * self._gamma_log) / (gamma + 1)
+
+
+class TypeStatistics:
+    """
+    The running figures of one vehicle type.
+
+    Attributes:
+        count (int): The number of orders.
+        revenue (int): The summed total cost of the orders, in öre.
+        part_costs (dict[str, int]): The summed cost of each part.
+        engine_sizes (dict[int, int]):
+        Order counts by engine size bin, keyed by the lower bound of
+        each bin in cc. Empty for vehicles without an engine.
+        values (QuantileSketch): The distribution of order values.
+    """
+
+    __slots__ = ("count", "revenue", "part_costs", "engine_sizes", "values")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.count = 0
+        self.revenue = 0
+        self.part_costs = {}
+        self.engine_sizes = {}
+        self.values = QuantileSketch(relative_accuracy)
+
+
+class OrderStatistics:
+    """
+    Per vehicle type aggregates of a stream of orders.
+
+    Attributes:
+        order_count (int): The number of orders added.
+        revenue (int): The summed total cost of all orders, in öre.
+        values (QuantileSketch): The distribution of all order values.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01,
+                 engine_bin_cc: int = ENGINE_BIN_CC):
+        """
+        Args:
+            relative_accuracy (float, optional):
+            The relative error of quantile estimates. Default is 0.01.
+            engine_bin_cc (int, optional):
+            Width of the engine size histogram bins. Default is 250.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.engine_bin_cc = engine_bin_cc
+        self.order_count = 0
+        self.revenue = 0
+        self.values = QuantileSketch(relative_accuracy)
+        self._types = {}
+
+    def _type(self, name: str) -> TypeStatistics:
+        """Returns the figures of a vehicle type, creating them if new."""
+        statistics = self._types.get(name)
+        if statistics is None:
+            statistics = self._types[name] = \
+                TypeStatistics(self.relative_accuracy)
+        return statistics
+
+    def add(self, order: dict):
+        """
+        Adds an order to the statistics.
+
+        Args:
+            order (dict):
+            The details of the order, with "Name", "Parts",
+            "TotalCost" and, if it has an engine, "EngineSize".
+        """
+        total = order["TotalCost"]
+        self.order_count += 1
+        self.revenue += total
+        self.values.add(total)
+
+        statistics = self._type(order["Name"])
+        statistics.count += 1
+        statistics.revenue += total
+        statistics.values.add(total)
+        part_costs = statistics.part_costs
+        for part, cost in (order.get("Parts") or {}).items():
+            part_costs[part] = part_costs.get(part, 0) + cost
+        engine_size = order.get("EngineSize")
+        if engine_size is not None:
+            low = engine_size // self.engine_bin_cc * self.engine_bin_cc
+            engine_sizes = statistics.engine_sizes
+            engine_sizes[low] = engine_sizes.get(low, 0) + 1
+
+    def add_records(self, records, names: dict):
+        """
+        Adds many orders at once from binary order records, e.g. when
+        loading a snapshot, with the same result as adding each order.
+
+        Args:
+            records (numpy.ndarray):
+            Records as returned by `order_export.load_numpy`.
+            names (dict[int, str]): The vehicle name of each type code.
+        """
+        import numpy as np
+        for code in np.unique(records["type_code"]).tolist():
+            selected = records[records["type_code"] == code]
+            totals = selected["total"]
+            values, counts = np.unique(totals, return_counts=True)
+            statistics = self._type(names[code])
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.values.add(value, count)
+                statistics.values.add(value, count)
+            revenue = int(totals.sum())
+            self.order_count += len(selected)
+            self.revenue += revenue
+            statistics.count += len(selected)
+            statistics.revenue += revenue
+
+            sizes = selected["engine_size"]
+            with_engine = sizes != 0
+            part_costs = statistics.part_costs
+            for part, column in (("Chassis", "chassis"), ("Tires", "tires")):
+                part_costs[part] = part_costs.get(part, 0) \
+                    + int(selected[column].sum())
+            if with_engine.any():
+                part_costs["Engine"] = part_costs.get("Engine", 0) \
+                    + int(selected["engine"][with_engine].sum())
+                bins, counts = np.unique(
+                    sizes[with_engine] // self.engine_bin_cc,
+                    return_counts=True)
+                engine_sizes = statistics.engine_sizes
+                for low, count in zip((bins * self.engine_bin_cc).tolist(),
+                                      counts.tolist()):
+                    engine_sizes[low] = engine_sizes.get(low, 0) + count
+
+    def merge(self, other: OrderStatistics):
+        """
+        Adds the figures of another `OrderStatistics` to these.
+
+        The other statistics may be updated by another thread while
+        being merged; orders it adds meanwhile may be partly counted.
+
+        Args:
+            other (OrderStatistics):
+            Statistics with the same accuracy and bin width.
+
+        Raises:
+            ValueError: If the accuracy or bin width differ, in which
+            case these statistics are left unchanged.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge statistics of different accuracy")
+        if other.engine_bin_cc != self.engine_bin_cc:
+            raise ValueError("Cannot merge statistics of different bin width")
+        self.order_count += other.order_count
+        self.revenue += other.revenue
+        self.values.merge(other.values)
+        for name, theirs in list(other._types.items()):
+            ours = self._type(name)
+            ours.count += theirs.count
+            ours.revenue += theirs.revenue
+            ours.values.merge(theirs.values)
+            for part, cost in list(theirs.part_costs.items()):
+                ours.part_costs[part] = ours.part_costs.get(part, 0) + cost
+            for low, count in list(theirs.engine_sizes.items()):
+                ours.engine_sizes[low] = ours.engine_sizes.get(low, 0) + count
+
+    def vehicle_types(self) -> list:
+        """Returns the names of the vehicle types ordered so far."""
+        return list(self._types)
+
+    def count(self, vehicle_type: str = None) -> int:
+        """
+        Returns the number of orders, of one vehicle type or in total.
+
+        Args:
+            vehicle_type (str, optional): The vehicle name, e.g. "Car".
+        """
+        if vehicle_type is None:
+            return self.order_count
+        statistics = self._types.get(vehicle_type)
+        return statistics.count if statistics else 0
+
+    def get_revenue(self, vehicle_type: str = None) -> int:
+        """
+        Returns the summed cost of orders, of one type or in total.
+
+        Args:
+            vehicle_type (str, optional): The vehicle name, e.g. "Car".
+        """
+        if vehicle_type is None:
+            return self.revenue
+        statistics = self._types.get(vehicle_type)
+        return statistics.revenue if statistics else 0
+
+    def part_costs(self, vehicle_type: str) -> dict:
+        """
+        Returns the summed cost of each part of a vehicle type.
+
+        Args:
+            vehicle_type (str): The vehicle name, e.g. "Car".
+        """
+        statistics = self._types.get(vehicle_type)
+        return dict(statistics.part_costs) if statistics else {}
+
+    def engine_histogram(self, vehicle_type: str) -> dict:
+        """
+        Returns the order counts of a vehicle type by engine size.
+
+        Args:
+            vehicle_type (str): The vehicle name, e.g. "Car".
+
+        Returns:
+            dict[int, int]:
+            Order counts keyed by the lower bound of each bin in cc,
+            in ascending order.
+        """
+        statistics = self._types.get(vehicle_type)
+        if statistics is None:
+            return {}
+        return dict(sorted(statistics.engine_sizes.items()))
+
+    def value_quantile(self, q: float, vehicle_type: str = None) -> float:
+        """
+        Estimates a quantile of order values, of one type or overall.
+
+        Args:
+            q (float): The quantile, from 0 to 1.
+            vehicle_type (str, optional): The vehicle name, e.g. "Car".
+
+        Returns:
+            float: The estimate, or None if there are no such orders.
+        """
+        if vehicle_type is None:
+            return self.values.quantile(q)
+        statistics = self._types.get(vehicle_type)
+        return statistics.values.quantile(q) if statistics else None
+
+    def summary(self) -> dict:
+        """
+        Returns all figures per vehicle type.
+
+        Returns:
+            dict: For each vehicle name, a dict with "count",
+            "revenue", "part_costs", "engine_sizes" and the estimated
+            "p50", "p90" and "p99" order values.
+        """
+        return {
+            name: {
+                "count": statistics.count,
+                "revenue": statistics.revenue,
+                "part_costs": dict(statistics.part_costs),
+                "engine_sizes": self.engine_histogram(name),
+                "p50": statistics.values.quantile(0.5),
+                "p90": statistics.values.quantile(0.9),
+                "p99": statistics.values.quantile(0.99),
+            }
+            for name, statistics in self._types.items()
+        }
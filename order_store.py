@@ -0,0 +1,263 @@
+from __future__ import annotations
+from array import array
+from collections.abc import Mapping
+from vehicle_factory import VehicleType
+
+
+def type_code(name: str) -> int:
+    """
+    Converts a vehicle name, as found in an order, to its type code.
+
+    Args:
+        name (str): The vehicle name, e.g. "Car".
+
+    Returns:
+        int: The `VehicleType` value of the vehicle.
+
+    Raises:
+        ValueError: If the name is not a built-in vehicle type. Types
+        added by plugins have no type code.
+    """
+    try:
+        return VehicleType[name.upper()].value
+    except KeyError:
+        raise ValueError(f"Vehicle type {name} has no type code; only "
+                         "built-in vehicles can be stored compactly or "
+                         "exported as binary records") from None
+
+
+def type_name(code: int) -> str:
+    """
+    Converts a type code back to the vehicle name used in orders.
+
+    Args:
+        code (int): A `VehicleType` value.
+
+    Returns:
+        str: The vehicle name, e.g. "Car".
+    """
+    return VehicleType(code).name.capitalize()
+
+
+class OrderRow(Mapping):
+    """
+    A read-only view of one order held in a `ColumnarOrderStore`.
+
+    Behaves like the order dictionaries produced by
+    `assemble_vehicle`, so it can be passed to
+    `OrderManager.format_order` and anything else expecting an order.
+    Values are read from the store's columns on access.
+    """
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: ColumnarOrderStore, index: int):
+        self._store = store
+        self._index = index
+
+    def _keys(self) -> tuple:
+        """Returns the keys present in this order."""
+        if self._store._engine_sizes[self._index]:
+            return ("Name", "Parts", "TotalCost", "EngineSize")
+        return ("Name", "Parts", "TotalCost")
+
+    def __getitem__(self, key: str):
+        store, index = self._store, self._index
+        if key == "Name":
+            return type_name(store._type_codes[index])
+        if key == "Parts":
+            return store._parts(index)
+        if key == "TotalCost":
+            return sum(store._parts(index).values())
+        if key == "EngineSize" and store._engine_sizes[index]:
+            return store._engine_sizes[index]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __repr__(self) -> str:
+        return f"OrderRow({dict(self)!r})"
+
+
+class ColumnarOrderStore:
+    """
+    A compact, array-backed container for orders.
+
+    Instead of one dictionary per order, each field is kept in its own
+    typed array: a vehicle type code, the engine size and one cost
+    column per part, about 30 bytes per order in total. The total cost
+    is not stored but summed from the parts when read, and vehicles
+    without an engine hold `NO_ENGINE` in the engine column. Costs are
+    integer öre in int64 columns, so column sums are exact.
+
+    Supports the list operations `OrderManager` relies on (append,
+    len, indexing and iteration), handing out `OrderRow` views in
+    place of dictionaries.
+    """
+
+    PARTS = ("Chassis", "Tires", "Engine")
+    NO_ENGINE = -1
+
+    def __init__(self):
+        """Initializes an empty store."""
+        self._type_codes = array("B")
+        self._engine_sizes = array("I")
+        self._costs = {part: array("q") for part in self.PARTS}
+
+    def append(self, order: Mapping):
+        """
+        Adds an order to the end of the store.
+
+        Args:
+            order (Mapping):
+            An order as returned by `assemble_vehicle`.
+
+        Raises:
+            ValueError:
+            If the order names an unknown vehicle type, has parts the
+            store has no column for, a total that differs from the
+            sum of its parts, or an engine size or cost out of the
+            range of its column. The store is then left unchanged.
+        """
+        parts = order.get("Parts") or {}
+        unknown = set(parts) - set(self.PARTS)
+        if unknown:
+            raise ValueError(f"Unsupported parts in order: {sorted(unknown)}")
+        if order["TotalCost"] != sum(parts.values()):
+            raise ValueError("Order total does not match the sum of its parts")
+
+        code = type_code(order["Name"])
+        length = len(self._type_codes)
+        costs = self._costs
+        try:
+            self._type_codes.append(code)
+            self._engine_sizes.append(order.get("EngineSize") or 0)
+            costs["Chassis"].append(parts.get("Chassis", 0))
+            costs["Tires"].append(parts.get("Tires", 0))
+            costs["Engine"].append(parts.get("Engine", self.NO_ENGINE))
+        except (OverflowError, TypeError) as error:
+            # Keep the columns the same length.
+            for column in (self._type_codes, self._engine_sizes,
+                           *costs.values()):
+                del column[length:]
+            raise ValueError(f"Order does not fit the store: {error}") \
+                from None
+
+    def extend_records(self, records):
+        """
+        Appends many orders at once from binary order records, e.g.
+        when loading a snapshot, copying whole columns.
+
+        Args:
+            records (numpy.ndarray):
+            Records as returned by `order_export.load_numpy`.
+
+        Raises:
+            ValueError:
+            If a record has an unknown type code or a total that
+            differs from the sum of its parts. Nothing is appended.
+        """
+        import numpy as np
+        codes = records["type_code"]
+        if not np.isin(codes, [vehicle_type.value
+                               for vehicle_type in VehicleType]).all():
+            raise ValueError("Records hold unknown vehicle type codes")
+        sizes = records["engine_size"]
+        engine = np.where(sizes == 0, self.NO_ENGINE, records["engine"])
+        if (records["chassis"] + records["tires"]
+                + np.where(sizes == 0, 0, engine)
+                != records["total"]).any():
+            raise ValueError("Order total does not match the sum of its parts")
+
+        def column_bytes(column, values) -> bytes:
+            dtype = np.dtype(f"={column.typecode}")
+            return np.ascontiguousarray(values, dtype=dtype).tobytes()
+
+        self._type_codes.frombytes(column_bytes(self._type_codes, codes))
+        self._engine_sizes.frombytes(column_bytes(self._engine_sizes, sizes))
+        costs = self._costs
+        for part, values in (("Chassis", records["chassis"]),
+                             ("Tires", records["tires"]),
+                             ("Engine", engine)):
+            costs[part].frombytes(column_bytes(costs[part], values))
+
+    def columns(self, stop: int = None) -> dict:
+        """
+        Copies the columns of the first orders, in the layout of
+        binary order records (see `order_export.FIELDS`).
+
+        Copies are taken rather than views, so the store can keep
+        growing while they are used, e.g. by another thread.
+
+        Args:
+            stop (int, optional):
+            The number of orders to copy. Default is all orders.
+
+        Returns:
+            dict[str, numpy.ndarray]: The "type_code", "engine_size",
+            "chassis", "tires", "engine" and "total" columns. Vehicles
+            without an engine have zero engine cost.
+        """
+        import numpy as np
+        stop = len(self) if stop is None else stop
+        # Slicing copies, and is done before numpy sees the buffer.
+        costs = {part: np.frombuffer(column[:stop], dtype=np.int64)
+                 for part, column in self._costs.items()}
+        engine = np.maximum(costs["Engine"], 0)
+        sizes_dtype = np.dtype(f"={self._engine_sizes.typecode}")
+        return {
+            "type_code": np.frombuffer(self._type_codes[:stop],
+                                       dtype=np.uint8),
+            "engine_size": np.frombuffer(self._engine_sizes[:stop],
+                                         dtype=sizes_dtype),
+            "chassis": costs["Chassis"],
+            "tires": costs["Tires"],
+            "engine": engine,
+            "total": costs["Chassis"] + costs["Tires"] + engine,
+        }
+
+    def _parts(self, index: int) -> dict:
+        """
+        Builds the parts breakdown of the order at the given index.
+
+        Args:
+            index (int): Position of the order in the store.
+
+        Returns:
+            dict: Part names mapped to their costs.
+        """
+        costs = self._costs
+        parts = {
+            "Chassis": costs["Chassis"][index],
+            "Tires": costs["Tires"][index],
+        }
+        engine = costs["Engine"][index]
+        if engine != self.NO_ENGINE:
+            parts["Engine"] = engine
+        return parts
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the number of bytes held by the column arrays."""
+        columns = [self._type_codes, self._engine_sizes,
+                   *self._costs.values()]
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def __len__(self) -> int:
+        return len(self._type_codes)
+
+    def __getitem__(self, index: int) -> OrderRow:
+        length = len(self._type_codes)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("order index out of range")
+        return OrderRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self._type_codes)):
+            yield OrderRow(self, index)
@@ -0,0 +1,111 @@
+"""
+Parallel assembly of large order batches.
+
+Assembly is pure Python and bound to one core by the GIL, so large
+batches are split into chunks that are created and assembled in a
+pool of worker processes. The workers are given the prices and the
+registered vehicle types, including those of plugins, of the calling
+process. The assembled orders are added to an `OrderManager` in the
+same order as the specifications were given, regardless of which
+worker finishes first.
+
+Usage:
+>>> from vehicle_factory import VehicleType
+>>> specs = [(VehicleType.CAR, 1600), (VehicleType.BICYCLE, None)]
+>>> order_manager = assemble_batch(specs, max_workers=4)
+"""
+
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pricelist
+from batching import chunks
+from order_manager import OrderManager
+from vehicle_factory import VehicleFactory
+
+
+def _register_vehicles(registry: dict):
+    """
+    Registers the parent's vehicle types in a worker process, which
+    does not inherit them when started with spawn.
+
+    Args:
+        registry (dict): As returned by `VehicleFactory.registry`.
+    """
+    for vehicle_type, vehicle_class in registry.items():
+        VehicleFactory.register(vehicle_type, vehicle_class)
+
+
+def _assemble_chunk(specs: list, prices: pricelist.PriceSnapshot) -> list:
+    """
+    Creates and assembles the vehicles of one chunk.
+
+    Runs in a worker process. All vehicles are priced with the prices
+    the batch was started with, whatever the worker's own pricelist
+    holds.
+
+    Args:
+        specs (list[tuple[VehicleType, int | None]]):
+        Vehicle types and engine sizes.
+        prices (PriceSnapshot): The prices to assemble with.
+
+    Returns:
+        list[dict]: The assembled orders, in the order of `specs`.
+    """
+    orders = []
+    for vehicle_type, engine_size in specs:
+        vehicle = VehicleFactory.create_vehicle(vehicle_type)
+        vehicle.prices = prices
+        orders.append(vehicle.assemble_vehicle(engine_size))
+    return orders
+
+
+def assemble_batch(specs, order_manager: OrderManager = None,
+                   chunk_size: int = 10_000,
+                   max_workers: int = None) -> OrderManager:
+    """
+    Assembles a batch of vehicles in parallel and records the orders.
+
+    Specifications are read lazily and at most two chunks per worker
+    are in flight at a time, so arbitrarily large batches can be
+    streamed through.
+
+    Args:
+        specs (Iterable[tuple[VehicleType, int | None]]):
+        The vehicle type and engine size of each order.
+        order_manager (OrderManager, optional):
+        Receives the orders. A new, quiet OrderManager if None.
+        chunk_size (int, optional):
+        The number of orders assembled per task. Default is 10000.
+        max_workers (int, optional):
+        The number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        OrderManager: The order manager holding the orders.
+
+    Raises:
+        ValueError:
+        If a vehicle type is not recognized. Orders of chunks before
+        the failing one have already been added.
+    """
+    if order_manager is None:
+        order_manager = OrderManager(verbose=False)
+    max_workers = max_workers or os.cpu_count() or 1
+    prices = pricelist.current()
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_register_vehicles,
+                             initargs=(VehicleFactory.registry(),)) \
+            as executor:
+        in_flight = deque()
+        for chunk in chunks(specs, chunk_size):
+            in_flight.append(executor.submit(_assemble_chunk, chunk, prices))
+            if len(in_flight) >= 2 * max_workers:
+                for order in in_flight.popleft().result():
+                    order_manager.add_order(order)
+        while in_flight:
+            for order in in_flight.popleft().result():
+                order_manager.add_order(order)
+
+    return order_manager
@@ -6,43 +6,299 @@ Pricelist for various vehicle components.
 The cost values represent base prices for various vehicle components,
 such as chassis, tire, and engine.
 
-These values can be utilized across various modules where the cost 
-calculation for assembling a vehicle is required. Should any pricing
-need adjustment simply update this file.
+The constants below are the default prices. At runtime prices are
+read from a `PriceList`, which loads them from `pricelist.json` when
+present and can reload that file while the application is running.
+Each load produces an immutable, versioned `PriceSnapshot`; a vehicle
+keeps the snapshot it started with, so it is priced consistently even
+if the prices change halfway through its assembly.
 
-Note: All prices are given in SEK (Swedish Krona).
+The data file may also hold pricing rules, such as tiered engine
+pricing and volume discounts; see `pricing_rules`. They are compiled
+into each snapshot's `pricing` when the prices are loaded.
+
+Note: All prices are held as integer öre (1 SEK = 100 öre), see
+`money`. The data file gives them in SEK.
 
 Attributes:
-    CAR_CHASSIS (float): Base price for a car chassis.
-    CAR_TIRE (float): Base price for a car tire.
-    CAR_ENGINE_MTRL (float): Material cost for a car engine.
-    CAR_ENGINE_FIT_COEF (float): 
+    CAR_CHASSIS (int): Base price for a car chassis.
+    CAR_TIRE (int): Base price for a car tire.
+    CAR_ENGINE_MTRL (int): Material cost for a car engine.
+    CAR_ENGINE_FIT_COEF (int): 
     Fitting coefficient for car engine sizing cost calculations based
-    on engine size.
+    on engine size, per cc.
 
-    MOTORCYCLE_CHASSIS (float): Base price for a motorcycle chassis.
-    MOTORCYCLE_TIRE (float): Base price for a motorcycle tire.
-    MOTORCYCLE_ENGINE_MTRL (float): Material cost for a motorcycle engine.
-    MOTORCYCLE_ENGINE_FIT_COEF (float): 
+    MOTORCYCLE_CHASSIS (int): Base price for a motorcycle chassis.
+    MOTORCYCLE_TIRE (int): Base price for a motorcycle tire.
+    MOTORCYCLE_ENGINE_MTRL (int): Material cost for a motorcycle engine.
+    MOTORCYCLE_ENGINE_FIT_COEF (int): 
     Fitting coefficient for motorcycle engine sizing cost calculations
-    based on engine size.
+    based on engine size, per cc.
+
+    BICYCLE_CHASSIS (int): Base price for a bicycle chassis.
+    BICYCLE_TIRE (int): Base price for a bicycle tire.
 
-    BICYCLE_CHASSIS (float): Base price for a bicycle chassis.
-    BICYCLE_TIRE (float): Base price for a bicycle tire.
+Functions:
+    current: The current price snapshot.
+    version: The version of the current prices, used to key cached quotes.
 """
 
+from __future__ import annotations
+import itertools
+import json
+import logging
+import os
+import threading
+from typing import NamedTuple
+from money import to_ore
+from pricing_rules import CompiledPricing, compile_rules
+
 # CAR PARTS
-CAR_CHASSIS = 50_000  # SEK
-CAR_TIRE = 3_000  # SEK
-CAR_ENGINE_MTRL = 25_000  # SEK
-CAR_ENGINE_FIT_COEF = 59.50  # SEK
+CAR_CHASSIS = 5_000_000  # öre (50 000 SEK)
+CAR_TIRE = 300_000  # öre (3 000 SEK)
+CAR_ENGINE_MTRL = 2_500_000  # öre (25 000 SEK)
+CAR_ENGINE_FIT_COEF = 5_950  # öre (59.50 SEK)
 
 # MOTORCYCLE PARTS
-MOTORCYCLE_CHASSIS = 20_000  # SEK
-MOTORCYCLE_TIRE = 2_000  # SEK
-MOTORCYCLE_ENGINE_MTRL = 15_000  # SEK
-MOTORCYCLE_ENGINE_FIT_COEF = 44.50  # SEK
+MOTORCYCLE_CHASSIS = 2_000_000  # öre (20 000 SEK)
+MOTORCYCLE_TIRE = 200_000  # öre (2 000 SEK)
+MOTORCYCLE_ENGINE_MTRL = 1_500_000  # öre (15 000 SEK)
+MOTORCYCLE_ENGINE_FIT_COEF = 4_450  # öre (44.50 SEK)
 
 # BICYCLE PARTS
-BICYCLE_CHASSIS = 2_000  # SEK
-BICYCLE_TIRE = 800  # SEK
\ No newline at end of file
+BICYCLE_CHASSIS = 200_000  # öre (2 000 SEK)
+BICYCLE_TIRE = 80_000  # öre (800 SEK)
+
+
+class PriceSnapshot(NamedTuple):
+    """
+    An immutable set of prices.
+
+    Field names match the module constants, and prices are in öre.
+    `pricing` holds the compiled pricing rules, which engine costs
+    are evaluated with. Snapshots are never modified; a price change
+    produces a new snapshot with a higher version.
+    """
+    version: int
+    CAR_CHASSIS: int
+    CAR_TIRE: int
+    CAR_ENGINE_MTRL: int
+    CAR_ENGINE_FIT_COEF: int
+    MOTORCYCLE_CHASSIS: int
+    MOTORCYCLE_TIRE: int
+    MOTORCYCLE_ENGINE_MTRL: int
+    MOTORCYCLE_ENGINE_FIT_COEF: int
+    BICYCLE_CHASSIS: int
+    BICYCLE_TIRE: int
+    pricing: CompiledPricing
+
+
+PRICE_NAMES = PriceSnapshot._fields[1:-1]
+
+# The data file key holding the pricing rules.
+RULES_KEY = "rules"
+
+# Versions are drawn from one counter, so snapshots of different
+# PriceList instances never share a version.
+_versions = itertools.count()
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "pricelist.json")
+
+
+class PriceList:
+    """
+    Holds the current prices and reloads them from a data file.
+
+    The data file is a JSON object mapping price names, as used by the
+    module constants, to prices in SEK, plus optional pricing rules
+    under "rules". Prices it leaves out keep their default value.
+
+    Readers take the current `snapshot` without locking; reloading
+    builds a complete new snapshot before swapping it in, so a reader
+    always sees one consistent set of prices.
+
+    Attributes:
+        path (str | None): The data file prices are loaded from.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path (str, optional):
+            The data file to load prices from. If None, or if the file
+            does not exist, the module defaults are used.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._snapshot = self._build({})
+        if path is not None and os.path.exists(path):
+            self.reload()
+
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        """Returns the current prices."""
+        return self._snapshot
+
+    def _build(self, prices: dict) -> PriceSnapshot:
+        """
+        Creates a snapshot from the given prices and the defaults.
+
+        Args:
+            prices (dict): 
+            Prices in SEK overriding the defaults, and optional 
+            pricing rules.
+
+        Raises:
+            ValueError: 
+            If a price is unknown, not a number or has fractions of an
+            öre, or if the pricing rules are malformed.
+        """
+        unknown = set(prices) - set(PRICE_NAMES) - {RULES_KEY}
+        if unknown:
+            raise ValueError(f"Unknown prices: {sorted(unknown)}")
+        values = []
+        for name in PRICE_NAMES:
+            if name not in prices:
+                values.append(globals()[name])
+                continue
+            value = prices[name]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Price {name} must be a number")
+            try:
+                values.append(to_ore(value))
+            except ValueError:
+                raise ValueError(f"Price {name} must be a whole number "
+                                 "of öre") from None
+        named = dict(zip(PRICE_NAMES, values))
+        pricing = compile_rules(prices.get(RULES_KEY, {}), {
+            "Car": (named["CAR_ENGINE_MTRL"], named["CAR_ENGINE_FIT_COEF"]),
+            "Motorcycle": (named["MOTORCYCLE_ENGINE_MTRL"],
+                           named["MOTORCYCLE_ENGINE_FIT_COEF"]),
+        })
+        return PriceSnapshot(next(_versions), *values, pricing)
+
+    def update(self, prices: dict) -> PriceSnapshot:
+        """
+        Replaces the current prices.
+
+        Args:
+            prices (dict):
+            Prices in SEK by name, and optional pricing rules. Prices
+            left out keep their default value.
+
+        Returns:
+            PriceSnapshot: The new snapshot.
+
+        Raises:
+            ValueError: 
+            If a price is unknown or not a number, or the pricing 
+            rules are malformed.
+        """
+        with self._lock:
+            self._snapshot = self._build(prices)
+            return self._snapshot
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reloads the prices if the data file has changed.
+
+        Args:
+            force (bool, optional):
+            Reload even if the file appears unchanged. Default is False.
+
+        Returns:
+            bool: True if new prices were loaded.
+
+        Raises:
+            OSError: If the data file cannot be read.
+            ValueError: If the data file holds invalid prices.
+        """
+        if self.path is None:
+            return False
+        mtime = os.stat(self.path).st_mtime_ns
+        if not force and mtime == self._mtime:
+            return False
+        with open(self.path) as file:
+            prices = json.load(file)
+        if not isinstance(prices, dict):
+            raise ValueError(f"{self.path} must hold a JSON object")
+        self.update(prices)
+        self._mtime = mtime
+        return True
+
+    def watch(self, interval: float = 1.0) -> threading.Event:
+        """
+        Starts a daemon thread that reloads changed prices.
+
+        Errors while reloading are logged as warnings, once until the
+        error changes, and the previous prices stay in effect until
+        the file is valid again.
+
+        Args:
+            interval (float, optional):
+            Seconds between checks of the data file. Default is 1.
+
+        Returns:
+            threading.Event: Set it to stop watching.
+        """
+        stop = threading.Event()
+
+        def run():
+            last_error = None
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except (OSError, ValueError) as error:
+                    if str(error) != last_error:
+                        logging.warning('Could not reload prices from %s: %s',
+                                        self.path, error)
+                        last_error = str(error)
+                else:
+                    last_error = None
+
+        threading.Thread(target=run, name="pricelist-watch",
+                         daemon=True).start()
+        return stop
+
+
+PRICE_LIST = PriceList(DEFAULT_PATH)
+
+
+def current() -> PriceSnapshot:
+    """
+    Returns the current prices.
+
+    Returns:
+        PriceSnapshot: The prices of the application's `PriceList`.
+    """
+    return PRICE_LIST.snapshot
+
+
+def version() -> int:
+    """
+    Returns the version of the current prices.
+
+    The value changes whenever the prices are updated or reloaded, so
+    results computed under different prices can be told apart.
+
+    Returns:
+        int: The version of the current snapshot.
+    """
+    return PRICE_LIST.snapshot.version
+
+
+def volume_discount(amount: int, quantity: int) -> int:
+    """
+    Returns the volume discount on an order of several vehicles, by
+    the current pricing rules.
+
+    Args:
+        amount (int): The undiscounted amount, in öre.
+        quantity (int): The number of vehicles ordered.
+
+    Returns:
+        int: The discount, in öre. 0 if no discount applies.
+    """
+    return PRICE_LIST.snapshot.pricing.discount(amount, quantity)
@@ -0,0 +1,300 @@
+"""
+Declarative pricing rules, compiled to lookup tables.
+
+By default an engine costs its material price plus a fitting
+coefficient per cc, as given in the pricelist. The optional "rules"
+object of `pricelist.json` refines this without code changes:
+
+    "rules": {
+        "engine": {
+            "Car": {
+                "tiers": [{"from_cc": 3000, "per_cc": 75}],
+                "surcharges": [{"from_cc": 5000, "amount": 10000}]
+            }
+        },
+        "volume_discounts": [
+            {"min_quantity": 10, "percent": 5},
+            {"min_quantity": 50, "percent": 8.5}
+        ]
+    }
+
+Tiers change the fitting cost per cc from a given engine size on, so
+the car above costs 59.50 SEK per cc up to 3000cc and 75 SEK for each
+cc above. Surcharges add a fixed amount to engines of at least a given
+size. Volume discounts take a percentage off orders of at least a given
+number of vehicles; invoices apply them to the total of all the orders
+invoiced, and `quoting.quote_batch` to each quoted configuration.
+Amounts are in SEK, like the rest of the data file. Sizes and
+quantities must be whole numbers and percentages have at most two
+decimals; anything else is rejected rather than rounded.
+
+Rules are compiled once, when the prices are loaded, into a table of
+engine costs for every size from 0 to `TABLE_SIZE_CC`, so pricing an
+engine is a list lookup.
+"""
+
+from __future__ import annotations
+import bisect
+import itertools
+from decimal import Decimal
+from numbers import Integral
+from money import to_ore
+
+# Engine sizes up to this, in cc, are priced from a table. It covers
+# every legal engine size, see engine_powered_vehicle.
+TABLE_SIZE_CC = 8000
+
+
+def _rule_number(rule: dict, key: str, what: str):
+    """Returns a non-negative number of a rule, or raises ValueError."""
+    value = rule.get(key) if isinstance(rule, dict) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or value < 0:
+        raise ValueError(f"{what} needs a non-negative number {key!r}")
+    return value
+
+
+def _rule_integer(rule: dict, key: str, what: str) -> int:
+    """Returns a non-negative whole number of a rule, or raises ValueError."""
+    value = _rule_number(rule, key, what)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{what} needs a whole number {key!r}, "
+                         f"got {value!r}")
+    return int(value)
+
+
+def _basis_points(percent, what: str) -> int:
+    """Converts a percentage to basis points exactly, or raises ValueError."""
+    # Through str, so that 8.5 is taken as written.
+    points = Decimal(str(percent)) * 100
+    if not points.is_finite() or points != points.to_integral_value():
+        raise ValueError(f"{what} percent {percent!r} has more than two "
+                         "decimals")
+    return int(points)
+
+
+class EngineRule:
+    """
+    The compiled engine pricing of one vehicle.
+
+    Attributes:
+        material (int): The material cost of any engine, in öre.
+        breakpoints (list[int]): Sizes, in cc, where the rate changes.
+        rates (list[int]): The fitting cost per cc from each breakpoint.
+        surcharges (list[tuple[int, int]]):
+        Sizes from which a surcharge applies, with the surcharge.
+        table (list[int]): The engine cost of each size up to
+        `TABLE_SIZE_CC`.
+    """
+
+    __slots__ = ("material", "breakpoints", "rates", "surcharges", "table")
+
+    def __init__(self, material: int, per_cc: int, tiers=(), surcharges=()):
+        """
+        Args:
+            material (int): The material cost, in öre.
+            per_cc (int): The fitting cost per cc below any tier, in öre.
+            tiers (Iterable[tuple[int, int]], optional):
+            Sizes from which another fitting cost per cc applies.
+            surcharges (Iterable[tuple[int, int]], optional):
+            Sizes from which a fixed amount is added.
+        """
+        tiers = dict(tiers)
+        tiers.setdefault(0, per_cc)
+        self.material = material
+        self.breakpoints = sorted(tiers)
+        self.rates = [tiers[size] for size in self.breakpoints]
+        self.surcharges = sorted(surcharges)
+        self.table = self._build_table()
+
+    def _build_table(self) -> list:
+        """Prices every engine size up to `TABLE_SIZE_CC`."""
+        rates = []
+        for start, end, rate in zip(self.breakpoints,
+                                    self.breakpoints[1:] + [TABLE_SIZE_CC],
+                                    self.rates):
+            rates.extend([rate] * max(0, min(end, TABLE_SIZE_CC) - start))
+        # The cost of a size sums the rates of the cc below it.
+        table = list(itertools.accumulate(rates, initial=self.material))
+        for size, amount in self.surcharges:
+            for index in range(min(size, TABLE_SIZE_CC + 1), len(table)):
+                table[index] += amount
+        return table
+
+    def evaluate(self, size_cc: int) -> int:
+        """
+        Prices an engine from the breakpoints, for sizes off the table.
+
+        Args:
+            size_cc (int): The size of the engine in cc.
+
+        Returns:
+            int: The engine cost, in öre.
+        """
+        cost = self.material
+        for start, end, rate in zip(self.breakpoints,
+                                    self.breakpoints[1:] + [None],
+                                    self.rates):
+            if size_cc <= start:
+                break
+            cost += rate * ((size_cc if end is None else min(size_cc, end))
+                            - start)
+        for size, amount in self.surcharges:
+            if size_cc >= size:
+                cost += amount
+        return cost
+
+    def cost(self, size_cc: int) -> int:
+        """
+        Returns the cost of an engine.
+
+        Args:
+            size_cc (int): The size of the engine in cc.
+
+        Returns:
+            int: The engine cost, in öre.
+
+        Raises:
+            ValueError: If the size is not a whole number of cc, which
+            would not cost a whole number of öre.
+        """
+        if isinstance(size_cc, int) and 0 <= size_cc <= TABLE_SIZE_CC:
+            return self.table[size_cc]
+        if not isinstance(size_cc, Integral):
+            raise ValueError(
+                f"Engine size must be a whole number of cc, got {size_cc!r}")
+        return self.evaluate(int(size_cc))
+
+    def __reduce__(self):
+        # Worker processes rebuild the table rather than unpickle it.
+        tiers = zip(self.breakpoints, self.rates)
+        return (EngineRule, (self.material, self.rates[0], list(tiers),
+                             self.surcharges))
+
+
+class CompiledPricing:
+    """
+    The pricing rules of one set of prices, ready for evaluation.
+
+    Attributes:
+        engines (dict[str, EngineRule]): Engine pricing by vehicle name.
+        discount_quantities (list[int]):
+        Order quantities from which a volume discount applies.
+        discount_basis_points (list[int]):
+        The discount from each quantity, in hundredths of a percent.
+    """
+
+    __slots__ = ("engines", "discount_quantities", "discount_basis_points")
+
+    def __init__(self, engines: dict, volume_discounts=()):
+        """
+        Args:
+            engines (dict[str, EngineRule]):
+            Engine pricing by vehicle name.
+            volume_discounts (Iterable[tuple[int, int]], optional):
+            Minimum quantities and their discount in basis points.
+        """
+        self.engines = engines
+        discounts = sorted(volume_discounts)
+        self.discount_quantities = [quantity for quantity, _ in discounts]
+        self.discount_basis_points = [points for _, points in discounts]
+
+    def engine_cost(self, vehicle: str, size_cc: int) -> int:
+        """
+        Returns the cost of an engine.
+
+        Args:
+            vehicle (str): The vehicle name, e.g. "Car".
+            size_cc (int): The size of the engine in cc.
+
+        Returns:
+            int: The engine cost, in öre.
+
+        Raises:
+            ValueError: If there is no engine pricing for the vehicle.
+        """
+        try:
+            return self.engines[vehicle].cost(size_cc)
+        except KeyError:
+            raise ValueError(f"No engine pricing for {vehicle}") from None
+
+    def discount_rate(self, quantity: int) -> int:
+        """
+        Returns the volume discount for ordering `quantity` vehicles.
+
+        Args:
+            quantity (int): The number of vehicles in the order.
+
+        Returns:
+            int: The discount in basis points (hundredths of a percent).
+        """
+        index = bisect.bisect_right(self.discount_quantities, quantity)
+        return self.discount_basis_points[index - 1] if index else 0
+
+    def discount(self, amount: int, quantity: int) -> int:
+        """
+        Returns the volume discount on an amount, rounded to the öre.
+
+        Args:
+            amount (int): The undiscounted amount, in öre.
+            quantity (int): The number of vehicles in the order.
+
+        Returns:
+            int: The discount, in öre.
+        """
+        return (amount * self.discount_rate(quantity) + 5_000) // 10_000
+
+
+def compile_rules(rules: dict, engine_prices: dict) -> CompiledPricing:
+    """
+    Compiles pricing rules, as found in the data file.
+
+    Args:
+        rules (dict): The "rules" object, amounts in SEK. May be empty.
+        engine_prices (dict[str, tuple[int, int]]):
+        The material cost and fitting cost per cc, in öre, of each
+        engine-powered vehicle.
+
+    Returns:
+        CompiledPricing: The compiled rules.
+
+    Raises:
+        ValueError: If the rules are malformed.
+    """
+    if not isinstance(rules, dict):
+        raise ValueError("Pricing rules must be a JSON object")
+    unknown = set(rules) - {"engine", "volume_discounts"}
+    if unknown:
+        raise ValueError(f"Unknown pricing rules: {sorted(unknown)}")
+
+    engine_rules = rules.get("engine", {})
+    if not isinstance(engine_rules, dict):
+        raise ValueError("Engine rules must map vehicle names to rules")
+    unknown = set(engine_rules) - set(engine_prices)
+    if unknown:
+        raise ValueError(f"No engine prices for vehicles {sorted(unknown)}")
+
+    engines = {}
+    for vehicle, (material, per_cc) in engine_prices.items():
+        rule = engine_rules.get(vehicle, {})
+        if not isinstance(rule, dict):
+            raise ValueError(f"Engine rule of {vehicle} must be an object")
+        tiers = [(_rule_integer(tier, "from_cc", f"{vehicle} tier"),
+                  to_ore(_rule_number(tier, "per_cc", f"{vehicle} tier")))
+                 for tier in rule.get("tiers", ())]
+        surcharges = [
+            (_rule_integer(surcharge, "from_cc", f"{vehicle} surcharge"),
+             to_ore(_rule_number(surcharge, "amount",
+                                 f"{vehicle} surcharge")))
+            for surcharge in rule.get("surcharges", ())]
+        engines[vehicle] = EngineRule(material, per_cc, tiers, surcharges)
+
+    volume_discounts = []
+    for discount in rules.get("volume_discounts", ()):
+        quantity = _rule_integer(discount, "min_quantity", "Volume discount")
+        percent = _rule_number(discount, "percent", "Volume discount")
+        if percent > 100:
+            raise ValueError("Volume discounts cannot exceed 100 percent")
+        volume_discounts.append(
+            (quantity, _basis_points(percent, "Volume discount")))
+    return CompiledPricing(engines, volume_discounts)
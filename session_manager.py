@@ -0,0 +1,246 @@
+"""
+Per-session order books with a memory budget.
+
+`SessionManager` hands out one `OrderManager` per customer or session
+ID, creating it on first use. Only a bounded number of sessions and
+orders are kept in memory: when either budget is exceeded, the least
+recently used sessions are spilled to disk as binary order files (see
+`order_export`) and reloaded when next used. Sessions idle for too
+long can be spilled with `evict_idle`.
+
+Usage:
+>>> sessions = SessionManager("sessions", max_sessions=100)
+>>> with sessions.session("customer-42") as order_manager:
+...     order_manager.add_order(order)
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+from batching import checked_file_name
+from order_export import BinaryOrderFile
+from order_manager import OrderManager
+
+
+class _Session:
+    """An order book held in memory, with its bookkeeping."""
+
+    __slots__ = ("order_manager", "last_used", "saved_orders",
+                 "counted_orders", "pins")
+
+    def __init__(self, order_manager: OrderManager, saved_orders: int):
+        self.order_manager = order_manager
+        self.last_used = time.monotonic()
+        self.saved_orders = saved_orders
+        self.counted_orders = 0
+        self.pins = 0
+
+
+class SessionManager:
+    """
+    Keeps the order books of many sessions within a memory budget.
+
+    An OrderManager returned by `get` may be spilled by any later call
+    and then no longer belongs to the session; do not keep it. Use
+    `session` to hold on to one for the length of a block.
+
+    The orders of a session are counted towards `max_orders` whenever
+    the session is used, so orders added through an OrderManager from
+    `get` count once the session is next used.
+
+    Attributes:
+        spill_dir (str): The directory spilled sessions are written to.
+        max_sessions (int): The most sessions kept in memory.
+        max_orders (int): The most orders kept in memory, in total.
+        compact (bool): Whether order books use a `ColumnarOrderStore`.
+    """
+
+    def __init__(self, spill_dir: str = "sessions", max_sessions: int = 1000,
+                 max_orders: int = 1_000_000, compact: bool = True):
+        """
+        Args:
+            spill_dir (str, optional):
+            The directory to spill sessions to, created if missing.
+            Default is "sessions".
+            max_sessions (int, optional):
+            The most sessions kept in memory. Default is 1000.
+            max_orders (int, optional):
+            The most orders kept in memory over all sessions.
+            A single session may exceed it. Default is 1000000.
+            compact (bool, optional):
+            Keep order books in a `ColumnarOrderStore`. Default is True.
+        """
+        os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = spill_dir
+        self.max_sessions = max_sessions
+        self.max_orders = max_orders
+        self.compact = compact
+        self._sessions = OrderedDict()
+        self._resident_orders = 0
+        self._lock = threading.RLock()
+
+    def spill_path(self, session_id: str) -> str:
+        """
+        Returns the file a session is spilled to.
+
+        Args:
+            session_id (str): The session ID.
+
+        Raises:
+            ValueError: If the ID cannot be used in a file name.
+        """
+        session_id = checked_file_name(session_id, "Session ID")
+        return os.path.join(self.spill_dir, f"session_{session_id}.bin")
+
+    def _load(self, session_id: str) -> _Session:
+        """Creates a session, reloading its orders if it was spilled."""
+        path = self.spill_path(session_id)
+        order_manager = OrderManager(verbose=False, compact=self.compact)
+        if os.path.exists(path):
+            with BinaryOrderFile(path) as orders:
+                for order in orders:
+                    order_manager.add_order(order)
+            logging.info('Reloaded session %s with %d orders', session_id,
+                         order_manager.get_total_orders())
+        return _Session(order_manager, order_manager.get_total_orders())
+
+    def _touch(self, session_id: str) -> _Session:
+        """Returns a session, loading it if needed, as most recent."""
+        session_id = str(session_id)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = self._load(session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        self._count(session)
+        return session
+
+    def _count(self, session: _Session):
+        """Updates the resident order count with a session's orders."""
+        orders = session.order_manager.get_total_orders()
+        self._resident_orders += orders - session.counted_orders
+        session.counted_orders = orders
+
+    def get(self, session_id: str) -> OrderManager:
+        """
+        Returns the order book of a session, creating or reloading it
+        if it is not in memory.
+
+        Args:
+            session_id (str): The customer or session ID.
+
+        Returns:
+            OrderManager: The session's order book.
+
+        Raises:
+            ValueError: If the ID cannot be used in a file name.
+        """
+        with self._lock:
+            session = self._touch(session_id)
+            self._enforce_budget()
+            return session.order_manager
+
+    @contextmanager
+    def session(self, session_id: str):
+        """
+        Keeps the order book of a session in memory while in use.
+
+        Args:
+            session_id (str): The customer or session ID.
+
+        Yields:
+            OrderManager: The session's order book.
+        """
+        with self._lock:
+            session = self._touch(session_id)
+            session.pins += 1
+            self._enforce_budget()
+        try:
+            yield session.order_manager
+        finally:
+            with self._lock:
+                session.pins -= 1
+                session.last_used = time.monotonic()
+                session_id = str(session_id)
+                if self._sessions.get(session_id) is session:
+                    self._sessions.move_to_end(session_id)
+                    self._count(session)
+                self._enforce_budget()
+
+    def _spill(self, session_id: str, session: _Session):
+        """Writes a session to disk, unless unchanged, and drops it."""
+        order_manager = session.order_manager
+        if order_manager.get_total_orders() != session.saved_orders:
+            order_manager.export_binary(self.spill_path(session_id))
+        del self._sessions[session_id]
+        self._resident_orders -= session.counted_orders
+
+    def _enforce_budget(self):
+        """Spills the least recently used sessions while over budget."""
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions \
+                    and self._resident_orders <= self.max_orders:
+                break
+            if not session.pins:
+                self._spill(session_id, session)
+
+    def evict_idle(self, max_idle: float) -> int:
+        """
+        Spills the sessions not used for a while.
+
+        Args:
+            max_idle (float): Seconds since a session's last use.
+
+        Returns:
+            int: The number of sessions spilled.
+        """
+        deadline = time.monotonic() - max_idle
+        spilled = 0
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                if session.last_used > deadline:
+                    break
+                if not session.pins:
+                    self._spill(session_id, session)
+                    spilled += 1
+        return spilled
+
+    def flush(self):
+        """Spills every session that is not in use."""
+        self.evict_idle(0)
+
+    def drop(self, session_id: str):
+        """
+        Discards a session, in memory and on disk.
+
+        Args:
+            session_id (str): The customer or session ID.
+        """
+        path = self.spill_path(session_id)
+        with self._lock:
+            session = self._sessions.pop(str(session_id), None)
+            if session is not None:
+                self._resident_orders -= session.counted_orders
+            if os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def resident_orders(self) -> int:
+        """
+        Returns the number of orders held in memory, as counted when
+        each session was last used.
+        """
+        return self._resident_orders
+
+    def __len__(self) -> int:
+        """Returns the number of sessions held in memory."""
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        """Returns whether a session is held in memory."""
+        return str(session_id) in self._sessions
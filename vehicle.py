@@ -1,6 +1,9 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 import logging
+import pricelist
+
+logger = logging.getLogger(__name__)
 
 class Vehicle(ABC):
     """
@@ -11,11 +14,16 @@ class Vehicle(ABC):
     methods and properties that must be implemented by any 
     concrete subclass.
 
+    All costs are integers in öre (1 SEK = 100 öre), see `money`.
+
     Attributes:
     - _total_cost: The total cost incurred in assembling the vehicle.
     - _no_of_tires: The number of tires fitted to the vehicle.
+    - _prices: The price snapshot the vehicle is priced with.
     
     Methods:
+    - reset: 
+    Returns the vehicle to its unassembled state, so it can be reused.
     - fit_chassis: Fits the chassis and updates the total cost.
     - fit_tires: 
     Fits a specified number of tires and updates the total cost.
@@ -37,13 +45,62 @@ class Vehicle(ABC):
     of a tire.
     - total_cost: 
     Property that gets and sets the _total_cost attribute.
+    - prices: 
+    Property that gets and sets the price snapshot of the vehicle.
     """
-    _total_cost = 0
-    _no_of_tires = 0
+    __slots__ = ("_total_cost", "_no_of_tires", "_prices")
+    
+    def __init__(self, no_of_tires: int = 0):
+        """
+        Initializes an unassembled vehicle.
+
+        Args:
+        - no_of_tires (int, optional): 
+        The number of tires of the vehicle. Defaults to 0.
+        """
+        self._no_of_tires = no_of_tires
+        self.reset()
+    
+    def reset(self):
+        """
+        Return the vehicle to its unassembled state.
+
+        Clears the accumulated cost and the pinned prices, so the 
+        instance can be assembled again as if newly created. The 
+        number of tires is kept.
+        """
+        self._total_cost = 0
+        self._prices = None
+    
+    @property
+    def prices(self) -> pricelist.PriceSnapshot:
+        """
+        Property to get the prices the vehicle is priced with.
+
+        The current prices are taken on first use and kept until the
+        vehicle is reset, so a price reload cannot change the cost of
+        a vehicle halfway through its assembly.
+
+        Returns:
+        PriceSnapshot: The prices of the vehicle.
+        """
+        if self._prices is None:
+            self._prices = pricelist.current()
+        return self._prices
+    
+    @prices.setter
+    def prices(self, value: pricelist.PriceSnapshot):
+        """
+        Setter for the prices the vehicle is priced with.
+
+        Args:
+        - value (PriceSnapshot): The prices to use.
+        """
+        self._prices = value
     
     @property
     @abstractmethod
-    def chassis_cost(self) -> float:
+    def chassis_cost(self) -> int:
         """
         Abstract property that should return the cost of the vehicle's
         chassis.
@@ -63,7 +120,8 @@ class Vehicle(ABC):
         """
         self._total_cost += self.chassis_cost
         # Logs Fitting Chassis
-        logging.info(f"{self.get_name()} Chassis Fitted")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s Chassis Fitted", self.get_name())
     
     def fit_tires(self, no_of_tires: int):
         """
@@ -80,7 +138,8 @@ class Vehicle(ABC):
         self._no_of_tires = no_of_tires
         self._total_cost += self._no_of_tires * self.tire_cost
         # Logs Fitting of Tires
-        logging.info(f"New tires(x {self._no_of_tires}) fitted")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("New tires(x %s) fitted", self._no_of_tires)
 
     def assemble_vehicle_common(self, no_of_tires: int):
         """
@@ -133,7 +192,7 @@ class Vehicle(ABC):
     
     @property
     @abstractmethod
-    def tire_cost(self) -> float:
+    def tire_cost(self) -> int:
         """
         Abstract property that should return the cost of a single tire.
         
@@ -165,7 +224,7 @@ class Vehicle(ABC):
         vehicle.
         
         Returns:
-        float: 
+        int: 
         The total cost incurred in assembling the vehicle uptill now.
         """
         return self._total_cost
@@ -177,6 +236,6 @@ class Vehicle(ABC):
         vehicle.
 
         Args:
-        - value (float): The value to set the total cost to.
+        - value (int): The value to set the total cost to.
         """
         self._total_cost = value
\ No newline at end of file
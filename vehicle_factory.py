@@ -1,10 +1,13 @@
 from __future__ import annotations
+from collections import OrderedDict
 from enum import Enum
+import importlib
+import importlib.util
 import logging
+import os
+import threading
+import pricelist
 from vehicle import Vehicle
-from car import Car
-from motorcycle import Motorcycle
-from bicycle import Bicycle
 
 class VehicleType(Enum):
     """
@@ -19,6 +22,176 @@ class VehicleType(Enum):
     MOTORCYCLE = 2
     BICYCLE = 3
 
+# Where the built-in vehicles are found, as "module:class". Each module
+# is only imported the first time its vehicle type is requested.
+BUILTIN_VEHICLES = {
+    VehicleType.CAR: "car:Car",
+    VehicleType.MOTORCYCLE: "motorcycle:Motorcycle",
+    VehicleType.BICYCLE: "bicycle:Bicycle",
+}
+
+# Entry point group searched by `VehicleFactory.load_plugins`.
+ENTRY_POINT_GROUP = "vehicle_factory.vehicles"
+
+
+class _FilePlugin:
+    """
+    A vehicle class in a plugin file, imported when first loaded.
+
+    Attributes:
+        path (str): The plugin file.
+        class_name (str): The name of the vehicle class in the file.
+    """
+
+    def __init__(self, path: str, class_name: str):
+        self.path = path
+        self.class_name = class_name
+
+    def load(self):
+        """Imports the plugin file and returns its vehicle class."""
+        module_name = os.path.splitext(os.path.basename(self.path))[0]
+        spec = importlib.util.spec_from_file_location(module_name, self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return getattr(module, self.class_name)
+
+
+class QuoteCache:
+    """
+    A bounded, least-recently-used cache of assembled orders.
+
+    Keys are expected to include the pricelist version, so quotes made
+    under old prices are never returned; they simply age out.
+
+    Attributes:
+        maxsize (int): The maximum number of quotes kept.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups not found in the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Args:
+            maxsize (int, optional):
+            The maximum number of quotes kept. Default is 1024.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> dict | None:
+        """
+        Looks up a quote, marking it as recently used.
+
+        Args:
+            key (Hashable): The key the quote was stored under.
+
+        Returns:
+            dict | None: The cached order, or None on a miss.
+        """
+        with self._lock:
+            order = self._entries.get(key)
+            if order is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return order
+
+    def put(self, key, order: dict):
+        """
+        Stores a quote, evicting the least recently used if full.
+
+        Args:
+            key (Hashable): The key to store the quote under.
+            order (dict): The assembled order.
+        """
+        with self._lock:
+            self._entries[key] = order
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all quotes and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VehiclePool:
+    """
+    A pool of reusable vehicle instances, one free list per type.
+    Types are keyed as in the factory's registry, so "car" and
+    `VehicleType.CAR` share a list.
+
+    Released vehicles are reset and handed out again by `acquire`, 
+    so a hot loop assembling many vehicles does not allocate a new 
+    object for each one.
+
+    Attributes:
+        max_idle (int): The maximum number of idle vehicles kept per type.
+    """
+
+    def __init__(self, max_idle: int = 16):
+        """
+        Args:
+            max_idle (int, optional):
+            The maximum number of idle vehicles kept per type.
+            Default is 16.
+        """
+        self.max_idle = max_idle
+        self._idle = {}
+        self._types = {}
+
+    def acquire(self, vehicle_type: VehicleType) -> Vehicle:
+        """
+        Hands out an unassembled vehicle of the given type.
+
+        Args:
+            vehicle_type (VehicleType | str):
+            The type of vehicle wanted, or its name.
+
+        Returns:
+            Vehicle: A pooled vehicle, or a new one if none is idle.
+
+        Raises:
+            ValueError:
+            If the provided vehicle_type is None or not recognized.
+        """
+        key = VehicleFactory.type_key(vehicle_type)
+        try:
+            return self._idle[key].pop()
+        except (KeyError, IndexError):
+            vehicle = VehicleFactory.create_vehicle(key)
+            self._types[type(vehicle)] = key
+            return vehicle
+
+    def release(self, vehicle: Vehicle):
+        """
+        Resets a vehicle and returns it to the pool.
+
+        The vehicle must not be used by the caller afterwards. 
+        Vehicles beyond `max_idle` are left to the garbage collector.
+
+        Args:
+            vehicle (Vehicle): A vehicle handed out by `acquire`.
+        """
+        vehicle_type = self._types.get(type(vehicle))
+        if vehicle_type is None:
+            return
+        idle = self._idle.setdefault(vehicle_type, [])
+        if len(idle) < self.max_idle:
+            vehicle.reset()
+            idle.append(vehicle)
+
+
 class VehicleFactory:
     """
     A class providing a factory method to create vehicle instances
@@ -29,11 +202,281 @@ class VehicleFactory:
     various vehicle types and ensuring that the client code 
     adheres to the Open/Closed Principle in the SOLID guidelines.
 
+    Vehicle types are looked up in a registry mapping each type to 
+    its class. Classes are given as "module:class" and imported the 
+    first time they are needed, so only the vehicles actually built 
+    are ever imported. New vehicle types are added by registering 
+    them, directly or through plugins, without changing this class.
+
     Methods:
     - create_vehicle: 
     Creates a vehicle instance based on the provided vehicle type.
+    - register: 
+    Registers the class for a vehicle type.
+    - registry: 
+    Returns the registered types, e.g. to register in a worker.
+    - load_plugins: 
+    Registers vehicle types from entry points and plugin files.
+    - type_key: 
+    Converts a vehicle type or its name to its registry key.
+    - is_registered: 
+    Checks whether a vehicle type can be created.
+    - vehicle_class: 
+    Returns the class registered for a vehicle type.
+    - assemble: 
+    Creates and assembles a vehicle, optionally through a quote cache
+    and a pool of reusable vehicles.
+
+    Attributes:
+    - quote_cache (QuoteCache | None): 
+    Cache of assembled orders used by `assemble`, if enabled.
+    - vehicle_pool (VehiclePool | None): 
+    Pool of vehicles reused by `assemble`, if enabled.
     """
+
+    _registry = dict(BUILTIN_VEHICLES)
+    _classes = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, quote_cache_size: int = 0, pool_size: int = 0):
+        """
+        Args:
+        - quote_cache_size (int, optional): 
+        Number of quotes to memoize in `assemble`. Default is 0, 
+        which disables the cache.
+        - pool_size (int, optional): 
+        Number of idle vehicles per type kept for reuse by 
+        `assemble`. Default is 0, which disables pooling.
+        """
+        self.quote_cache = \
+            QuoteCache(quote_cache_size) if quote_cache_size else None
+        self.vehicle_pool = VehiclePool(pool_size) if pool_size else None
+
+    def assemble(self, vehicle_type: VehicleType,
+                 engine_size: int = None) -> dict:
+        """
+        Creates a vehicle of the given type and assembles it.
+
+        With the quote cache enabled, repeated configurations are 
+        answered from the cache instead of being assembled again. 
+        Cached quotes are keyed by the pricelist version, so a price 
+        change is picked up automatically.
+
+        Args:
+        - vehicle_type (VehicleType): 
+        Enum representing the type of vehicle to be created.
+        - engine_size (int, optional): 
+        Size of the engine in cubic centimeters. Ignored for 
+        vehicles without an engine.
+
+        Returns:
+        dict: The assembled order, as returned by `assemble_vehicle`.
+        The caller owns the returned dictionary.
+
+        Raises:
+        - ValueError: 
+        If the provided vehicle_type is None or not recognized.
+        """
+        key = None
+        if self.quote_cache is not None:
+            prices = pricelist.current()
+            key = (vehicle_type, engine_size, prices.version)
+            order = self.quote_cache.get(key)
+            if order is not None:
+                return {**order, "Parts": dict(order["Parts"])}
+
+        pool = self.vehicle_pool
+        if pool is None:
+            vehicle = self.create_vehicle(vehicle_type)
+        else:
+            vehicle = pool.acquire(vehicle_type)
+        try:
+            if key is not None:
+                vehicle.prices = prices
+            order = vehicle.assemble_vehicle(engine_size)
+        finally:
+            if pool is not None:
+                pool.release(vehicle)
+
+        if key is not None:
+            self.quote_cache.put(key, order)
+            return {**order, "Parts": dict(order["Parts"])}
+        return order
     
+    @staticmethod
+    def type_key(vehicle_type: VehicleType | str):
+        """
+        Converts a vehicle type to the key it is registered under.
+
+        Args:
+        - vehicle_type (VehicleType | str): 
+        A vehicle type, or its name in any case.
+
+        Returns:
+        VehicleType | str: The matching `VehicleType` member, or the 
+        upper-cased name of a type added by a plugin.
+        """
+        if isinstance(vehicle_type, str):
+            name = vehicle_type.strip().upper()
+            return VehicleType.__members__.get(name, name)
+        return vehicle_type
+
+    @classmethod
+    def register(cls, vehicle_type: VehicleType | str, vehicle_class):
+        """
+        Registers the class to create for a vehicle type.
+
+        Args:
+        - vehicle_type (VehicleType | str): 
+        The vehicle type, or the name of a new one such as "Truck".
+        - vehicle_class (type | str): 
+        The vehicle class, a "module:class" string naming it, or an 
+        object whose load() method returns it (e.g. an entry point).
+        Strings and loaders are resolved on first use.
+        """
+        key = cls.type_key(vehicle_type)
+        with cls._registry_lock:
+            cls._registry[key] = vehicle_class
+            cls._classes.pop(key, None)
+
+    @classmethod
+    def registry(cls) -> dict:
+        """
+        Returns the registered vehicle types in a form that can be
+        pickled and registered again in another process, e.g. so that
+        worker processes started with spawn know the plugin vehicles.
+
+        Returns:
+        dict: Each type's key mapped to its class, or to where the
+        class is found, as accepted by `register`.
+        """
+        with cls._registry_lock:
+            entries = dict(cls._registry)
+        for key, target in entries.items():
+            # Entry points are sent as the "module:class" they name.
+            value = getattr(target, "value", None)
+            if hasattr(target, "load") and isinstance(value, str):
+                entries[key] = value
+        return entries
+
+    @classmethod
+    def load_plugins(cls, directory: str = None,
+                     group: str = ENTRY_POINT_GROUP) -> list:
+        """
+        Registers the vehicle types provided by plugins.
+
+        Two sources are searched. Installed packages may advertise 
+        vehicles as entry points in `group`, named after the vehicle 
+        type with the class as value. A plugin directory may hold 
+        one .py file per vehicle type, named after the type and 
+        defining a class of the same name (truck.py holding Truck).
+        Nothing is imported until a type is first requested.
+
+        Args:
+        - directory (str, optional): 
+        A plugin directory to search as well.
+        - group (str, optional): 
+        The entry point group to search.
+
+        Returns:
+        list: The keys of the registered vehicle types.
+        """
+        from importlib.metadata import entry_points
+
+        registered = []
+        for entry_point in entry_points(group=group):
+            cls.register(entry_point.name, entry_point)
+            registered.append(cls.type_key(entry_point.name))
+
+        if directory is not None:
+            for file_name in sorted(os.listdir(directory)):
+                name, extension = os.path.splitext(file_name)
+                if extension != ".py" or name.startswith("_"):
+                    continue
+                plugin = _FilePlugin(os.path.join(directory, file_name),
+                                     name.capitalize())
+                cls.register(name, plugin)
+                registered.append(cls.type_key(name))
+        return registered
+
+    @classmethod
+    def is_registered(cls, vehicle_type: VehicleType | str) -> bool:
+        """
+        Checks whether a vehicle is registered for a vehicle type.
+
+        Args:
+        - vehicle_type (VehicleType | str): 
+        A vehicle type, or its name.
+
+        Returns:
+        bool: True if the type can be created.
+        """
+        return cls.type_key(vehicle_type) in cls._registry
+
+    @classmethod
+    def is_builtin(cls, vehicle_type: VehicleType | str) -> bool:
+        """
+        Checks whether a vehicle type is still served by its built-in
+        class, so that it may be priced without creating a vehicle
+        (see `quoting`).
+
+        Args:
+        - vehicle_type (VehicleType | str): 
+        A vehicle type, or its name.
+
+        Returns:
+        bool: True if the type is built in and not re-registered.
+        """
+        key = cls.type_key(vehicle_type)
+        return key in BUILTIN_VEHICLES \
+            and cls._registry.get(key) == BUILTIN_VEHICLES[key]
+
+    @classmethod
+    def vehicle_class(cls, vehicle_type: VehicleType | str) -> type:
+        """
+        Returns the class registered for a vehicle type, importing it
+        if this is the first request for the type.
+
+        Args:
+        - vehicle_type (VehicleType | str): 
+        A vehicle type, or its name.
+
+        Returns:
+        type: The vehicle class.
+
+        Raises:
+        - ValueError: 
+        If no vehicle is registered for the type.
+        """
+        key = cls.type_key(vehicle_type)
+        vehicle_class = cls._classes.get(key)
+        if vehicle_class is not None:
+            return vehicle_class
+
+        with cls._registry_lock:
+            target = cls._registry.get(key)
+        if target is None:
+            logging.error(f"Vehicle type {vehicle_type} not recognized")
+            raise ValueError(f"Vehicle type {vehicle_type} not recognized")
+
+        # Imported without the lock, as plugin modules may register
+        # vehicles when imported. Python's import lock keeps a module
+        # from being imported twice.
+        if isinstance(target, str):
+            module_name, _, class_name = target.partition(":")
+            vehicle_class = getattr(importlib.import_module(module_name),
+                                    class_name)
+        elif hasattr(target, "load"):
+            vehicle_class = target.load()
+        else:
+            vehicle_class = target
+
+        with cls._registry_lock:
+            # Not cached if the type was registered again meanwhile.
+            if cls._registry.get(key) is target:
+                cls._classes[key] = vehicle_class
+        return vehicle_class
+
     @staticmethod
     def create_vehicle(vehicle_type: VehicleType) -> Vehicle:
         """
@@ -44,8 +487,9 @@ class VehicleFactory:
         client code remains decoupled from the specific vehicle classes.
 
         Args:
-        - vehicle_type (VehicleType): 
-        Enum representing the type of vehicle to be created.
+        - vehicle_type (VehicleType | str): 
+        Enum representing the type of vehicle to be created, or the 
+        name of a vehicle type registered by a plugin.
 
         Returns:
         Vehicle: An instance of a subclass of Vehicle corresponding
@@ -62,12 +506,7 @@ class VehicleFactory:
             logging.error("None provided as the vehicle_type")
             raise ValueError("Vehicle type must not be None")
 
-        if vehicle_type == VehicleType.CAR:
-            return Car()
-        elif vehicle_type == VehicleType.MOTORCYCLE:
-            return Motorcycle()
-        elif vehicle_type == VehicleType.BICYCLE:
-            return Bicycle()
-        else:
-            logging.error(f"Vehicle type {vehicle_type} not recognized")
-            raise ValueError(f"Vehicle type {vehicle_type} not recognized")
\ No newline at end of file
+        vehicle_class = VehicleFactory._classes.get(vehicle_type)
+        if vehicle_class is None:
+            vehicle_class = VehicleFactory.vehicle_class(vehicle_type)
+        return vehicle_class()